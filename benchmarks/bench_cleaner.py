@@ -0,0 +1,122 @@
+"""清洗规则引擎基准：原 clean_tieba_data 的逐条 re.sub 与预编译、批量的 CleaningRules 对比
+
+默认在内存中按块生成合成帖子（内存占用与总量无关），只统计清洗本身的耗时；
+--files 时把合成帖子写成 JSON 文件，对比原函数（整体 json.load/json.dump）与流式清洗的端到端耗时。
+用法（在项目根目录）: python -m benchmarks.bench_cleaner [--count 1000000] [--files]
+"""
+import argparse
+import json
+import re
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+from data_processor.cleaner import parallel_clean_tieba_data, stream_clean_tieba_data
+from data_processor.rules import load_rules
+from spider.sink import write_json_array
+
+from .tieba_pages import make_post
+
+
+def legacy_clean_tieba_data(raw_json_path, output_json_path):
+    """引入规则引擎之前的 clean_tieba_data，原样保留作为对照"""
+    with open(raw_json_path, 'r', encoding='utf-8') as f:
+        raw_posts = json.load(f)
+
+    cleaned_posts = []
+    for post in raw_posts:
+        cleaned_post = legacy_clean_post(post)
+        if cleaned_post is not None:
+            cleaned_posts.append(cleaned_post)
+
+    with open(output_json_path, 'w', encoding='utf-8') as f:
+        json.dump(cleaned_posts, f, ensure_ascii=False, indent=2)
+    return output_json_path
+
+
+def legacy_clean_post(post):
+    combined_text = f"标题：{post.get('title', '')}\n内容：{post.get('content', '')}"
+    cleaned_text = re.sub(r'点击展开，查看完整图片|快捷键说明|播放出现小问题.*', '', combined_text)
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
+    if len(cleaned_text) > 20:
+        return {
+            'original_title': post.get('title', ''),
+            'original_author': post.get('author', ''),
+            'cleaned_text': cleaned_text,
+            'crawl_time': post.get('crawl_time', '')
+        }
+    return None
+
+
+def iter_chunks(count, chunk_size):
+    posts = (make_post(i) for i in range(count))
+    return iter(lambda: list(islice(posts, chunk_size)), [])
+
+
+def bench_in_memory(count, chunk_size):
+    rules = load_rules()
+    legacy_time = engine_time = 0.0
+    kept = 0
+    for i, chunk in enumerate(iter_chunks(count, chunk_size)):
+        start = time.perf_counter()
+        legacy = [cleaned for cleaned in map(legacy_clean_post, chunk) if cleaned is not None]
+        legacy_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        cleaned = rules.clean_batch(chunk)
+        engine_time += time.perf_counter() - start
+
+        if i == 0:
+            assert cleaned == legacy, "规则引擎与原函数的清洗结果不一致"
+        kept += len(cleaned)
+
+    print(f"合成帖子 {count} 条，保留 {kept} 条（每块 {chunk_size} 条，只计清洗耗时）")
+    print(f"原函数逐条 re.sub   {legacy_time:8.2f} 秒  {count / legacy_time:12,.0f} 条/秒")
+    print(f"规则引擎批量清洗    {engine_time:8.2f} 秒  {count / engine_time:12,.0f} 条/秒")
+    print(f"加速比: {legacy_time / engine_time:.2f}x")
+
+
+def bench_files(count, chunk_size, workers=None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_path = Path(tmp_dir) / "raw.json"
+        # 与爬虫 save_to_json 输出的原始文件格式相同（indent=2 的 JSON 数组）
+        write_json_array((post for chunk in iter_chunks(count, chunk_size) for post in chunk), raw_path)
+        size_mb = raw_path.stat().st_size / (1024 * 1024)
+        print(f"合成原始文件 {size_mb:.1f} MB，{count} 条")
+
+        start = time.perf_counter()
+        legacy_clean_tieba_data(raw_path, Path(tmp_dir) / "legacy.json")
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        stream_clean_tieba_data(raw_path, Path(tmp_dir) / "stream.json", progress_every=0)
+        stream_time = time.perf_counter() - start
+
+        same = (Path(tmp_dir) / "legacy.json").read_bytes() == (Path(tmp_dir) / "stream.json").read_bytes()
+        print(f"原函数（整体读写）  {legacy_time:8.2f} 秒  {count / legacy_time:12,.0f} 条/秒")
+        print(f"流式 + 规则引擎     {stream_time:8.2f} 秒  {count / stream_time:12,.0f} 条/秒")
+        print(f"加速比: {legacy_time / stream_time:.2f}x，输出一致: {same}")
+        if workers:
+            start = time.perf_counter()
+            parallel_clean_tieba_data(raw_path, Path(tmp_dir) / "parallel.json", workers=workers)
+            parallel_time = time.perf_counter() - start
+            same = (Path(tmp_dir) / "legacy.json").read_bytes() == (Path(tmp_dir) / "parallel.json").read_bytes()
+            print(f"{workers} 进程并行清洗      {parallel_time:8.2f} 秒  {count / parallel_time:12,.0f} 条/秒")
+            print(f"相对原函数加速比: {legacy_time / parallel_time:.2f}x，输出一致: {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--files', action='store_true', help='对比端到端的文件清洗')
+    parser.add_argument('--workers', type=int, default=None, help='--files 时额外测试多进程清洗')
+    args = parser.parse_args()
+    if args.files:
+        bench_files(args.count, args.chunk_size, args.workers)
+    else:
+        bench_in_memory(args.count, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
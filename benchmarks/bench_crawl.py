@@ -0,0 +1,123 @@
+"""爬虫吞吐基准：在本地替身服务器上运行 crawl_tieba，比较不同页数和并发度
+
+每个组合在新的子进程中运行（峰值 RSS 互不影响），报告帖子/秒、页面延迟 p50/p95 和峰值 RSS。
+页面延迟是一次 fetch_html 的耗时，包含调度排队与重试。
+用法（在项目根目录）:
+    python -m benchmarks.bench_crawl --pages 1 5 --concurrency 4 8 16 --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .fixture_server import FixtureServer, FixtureSite
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+FORUM = '华东师范大学'
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows 没有 resource 模块
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def _crawl(site_root, pages, concurrency):
+    from spider.fetch_policy import FetchPolicy
+    from spider.tieba_spider import TiebaSpider
+
+    class TimedSpider(TiebaSpider):
+        """记录每次取页面的耗时（fetch_html 也经过 fetch_parsed）"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.page_latencies = []
+
+        async def fetch_parsed(self, url, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await super().fetch_parsed(url, *args, **kwargs)
+            finally:
+                self.page_latencies.append(time.perf_counter() - started)
+
+    # 本地服务器不需要限速和自适应并发，退避缩短以免注入错误时基准耗时过长
+    spider = TimedSpider(FORUM, concurrency=concurrency, per_host_rate=None, adaptive=False, site_root=site_root,
+                         fetch_policy=FetchPolicy(base_delay=0.1, max_delay=1.0))
+    try:
+        started = time.perf_counter()
+        await spider.crawl_tieba(max_pages=pages)
+        elapsed = time.perf_counter() - started
+    finally:
+        await spider.close()
+    return {
+        'pages': pages,
+        'concurrency': concurrency,
+        'posts': spider.total_posts,
+        'errors': len(spider.errors),
+        'elapsed': elapsed,
+        'posts_per_second': spider.total_posts / elapsed if elapsed else 0.0,
+        'p50': _percentile(spider.page_latencies, 0.5),
+        'p95': _percentile(spider.page_latencies, 0.95),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_child(site_root, pages, concurrency):
+    """在新的子进程中跑一次爬取，返回结果字典"""
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_crawl', '--child', site_root, str(pages), str(concurrency)],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--latency', type=float, default=0.05, help='替身服务器每个请求的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--anti-bot-rate', type=float, default=0.0)
+    parser.add_argument('--threads-per-page', type=int, default=50)
+    parser.add_argument('--child', nargs=3, metavar=('SITE_ROOT', 'PAGES', 'CONCURRENCY'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        site_root, pages, concurrency = args.child
+        print(json.dumps(asyncio.run(_crawl(site_root, int(pages), int(concurrency)))))
+        return
+
+    site = FixtureSite(FORUM, total_pages=max(args.pages), threads_per_page=args.threads_per_page,
+                       latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       anti_bot_rate=args.anti_bot_rate)
+    print(f"替身服务器: 延迟 {args.latency}+{args.jitter} 秒，错误率 {args.error_rate}，"
+          f"验证页比例 {args.anti_bot_rate}，每页 {args.threads_per_page} 帖")
+    print(f"{'页数':>4}{'并发':>6}{'帖子':>7}{'失败':>6}{'耗时(s)':>9}{'帖子/秒':>9}"
+          f"{'p50(ms)':>9}{'p95(ms)':>9}{'峰值RSS(MB)':>13}")
+    with FixtureServer(site) as server:
+        for pages in args.pages:
+            for concurrency in args.concurrency:
+                r = run_child(server.url, pages, concurrency)
+                rss = f"{r['peak_rss_mb']:.1f}" if r['peak_rss_mb'] is not None else 'n/a'
+                print(f"{r['pages']:>4}{r['concurrency']:>6}{r['posts']:>7}{r['errors']:>6}{r['elapsed']:>9.2f}"
+                      f"{r['posts_per_second']:>9.1f}{r['p50'] * 1000:>9.1f}{r['p95'] * 1000:>9.1f}{rss:>13}")
+        print(f"替身服务器共处理 {site.requests} 个请求，注入错误 {site.injected} 次")
+
+
+if __name__ == '__main__':
+    main()
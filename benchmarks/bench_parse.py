@@ -0,0 +1,57 @@
+"""列表页解析微基准：CSS 选择器级联 vs 单次 lxml XPath 解析
+
+用法（在项目根目录）: python -m benchmarks.bench_parse [--repeat 20]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from requests_html import HTML
+
+from spider.lxml_parser import parse_thread_list
+from spider.tieba_spider import LIST_PAGE_SELECTOR, TiebaSpider
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+
+def load_list_pages():
+    """读取保存的列表页，并像 TiebaSpider 的静态解析那样展开 <code> 中的注释"""
+    return [TiebaSpider._static_html(path.read_text(encoding='utf-8'), url='https://tieba.baidu.com/f').html
+            for path in sorted(FIXTURE_DIR.glob("list_page_*.html"))]
+
+
+def parse_with_selectors(page_html):
+    html = HTML(html=page_html)
+    return [TiebaSpider.extract_post_fields(element) for element in html.find(LIST_PAGE_SELECTOR)]
+
+
+def bench(name, parse, pages, repeat):
+    threads = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            threads += len(parse(page))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {threads:>7} 个帖子  总耗时 {elapsed:8.3f} 秒  每帖 {elapsed / threads * 1e6:9.1f} 微秒")
+    return elapsed / threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_list_pages()
+    if not pages:
+        raise SystemExit(f"未找到测试页面: {FIXTURE_DIR}")
+    # 两种方式解析结果应一致
+    assert parse_with_selectors(pages[0]) == parse_thread_list(pages[0]), "两种解析方式结果不一致"
+
+    print(f"测试页面: {len(pages)} 个，重复 {args.repeat} 次")
+    css = bench('CSS 级联', parse_with_selectors, pages, args.repeat)
+    lxml = bench('lxml XPath', parse_thread_list, pages, args.repeat)
+    print(f"加速比: {css / lxml:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
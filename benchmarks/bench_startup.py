@@ -0,0 +1,84 @@
+"""冷启动基准：导入 spider、构造 TiebaSpider、完成第一个请求各自的耗时
+
+每次测量都在新的 Python 子进程中进行（保证是冷启动），第一个请求打到本地
+http.server 提供的列表页样本，不访问真实网站。
+用法（在项目根目录）: python -m benchmarks.bench_startup [--runs 10]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+FIXTURE = Path(__file__).parent / "fixtures" / "list_page_1.html"
+
+# 在子进程中执行，按阶段打印耗时（秒）
+CHILD_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from spider.tieba_spider import TiebaSpider
+imported = time.perf_counter()
+spider = TiebaSpider('华东师范大学', adaptive=False, site_root=sys.argv[1])
+constructed = time.perf_counter()
+
+async def first_request():
+    try:
+        return await spider.get_total_pages()
+    finally:
+        await spider.close()
+
+pages = asyncio.run(first_request())
+done = time.perf_counter()
+print(json.dumps({'import': imported - start, 'construct': constructed - imported,
+                  'first_request': done - constructed, 'total': done - start, 'pages': pages}))
+"""
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    def __init__(self, body, *args, **kwargs):
+        self.body = body
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_once(site_root):
+    result = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, site_root], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_FixtureHandler, FIXTURE.read_bytes()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    site_root = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        results = [run_once(site_root) for _ in range(args.runs)]
+    finally:
+        server.shutdown()
+
+    print(f"冷启动 {args.runs} 次，第一个请求共识别 {results[0]['pages']} 页")
+    for stage in ('import', 'construct', 'first_request', 'total'):
+        values = [r[stage] * 1000 for r in results]
+        print(f"{stage:<14} 中位数 {statistics.median(values):8.1f} 毫秒  最小 {min(values):8.1f} 毫秒")
+
+
+if __name__ == '__main__':
+    main()
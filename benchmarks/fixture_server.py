@@ -0,0 +1,188 @@
+"""本地贴吧替身服务器：提供帖子列表页和帖子页，可配置延迟、错误注入和语料规模
+
+列表页 /f?kw=<贴吧>&pn=<偏移> 和帖子页 /p/<帖子ID>?pn=<页码> 由 tieba_pages 按真实页面结构
+确定性生成；recorded_dir 中有 list_page_<页码>.html 时优先返回录制的列表页。
+爬虫通过 TiebaSpider(site_root=server.url) 指向这里，不需要访问真实网站。
+
+单独运行（在项目根目录）: python -m benchmarks.fixture_server --port 8765 --pages 20 --latency 0.05
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from .tieba_pages import make_list_page, make_thread_page, thread_page_count
+
+ANTI_BOT_PAGE = '<html><head><title>百度安全验证</title></head><body>网络不给力，请稍后重试</body></html>'
+_THREAD_PATH_RE = re.compile(r'^/p/(\d+)$')
+
+
+class FixtureSite:
+    """根据请求路径生成页面，并按配置注入延迟和错误
+
+    latency/jitter: 每个请求固定延迟加 [0, jitter) 的随机延迟（秒）；
+    error_rate: 以该概率返回 error_status；anti_bot_rate: 以该概率返回验证页（状态码 200）；
+    total_pages/threads_per_page: 语料规模，超出 total_pages 的列表页不含帖子。
+    """
+
+    def __init__(self, forum='华东师范大学', total_pages=10, threads_per_page=50, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, anti_bot_rate=0.0, recorded_dir=None, seed=0):
+        self.forum = forum
+        self.total_pages = total_pages
+        self.threads_per_page = threads_per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.anti_bot_rate = anti_bot_rate
+        self.recorded_dir = Path(recorded_dir) if recorded_dir else None
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.injected = 0
+
+    def _roll(self):
+        with self._lock:
+            self.requests += 1
+            return self._rng.random(), self._rng.random()
+
+    def delay(self):
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._rng.random() * self.jitter
+
+    @lru_cache(maxsize=4096)
+    def list_page(self, page_num):
+        if self.recorded_dir is not None:
+            recorded = self.recorded_dir / f"list_page_{page_num}.html"
+            if recorded.exists():
+                return recorded.read_bytes()
+        threads = self.threads_per_page if page_num <= self.total_pages else 0
+        return make_list_page(self.forum, page_num, threads_per_page=threads, total_pages=self.total_pages,
+                              seed=self.seed).encode('utf-8')
+
+    @lru_cache(maxsize=4096)
+    def thread_page(self, tid, page_num):
+        if page_num > thread_page_count(tid, self.seed):
+            return None
+        return make_thread_page(tid, page_num, seed=self.seed).encode('utf-8')
+
+    def respond(self, path):
+        """返回 (状态码, 响应体)"""
+        error_roll, anti_bot_roll = self._roll()
+        if error_roll < self.error_rate:
+            with self._lock:
+                self.injected += 1
+            return self.error_status, b'Service Unavailable'
+        if anti_bot_roll < self.anti_bot_rate:
+            with self._lock:
+                self.injected += 1
+            return 200, ANTI_BOT_PAGE.encode('utf-8')
+
+        parts = urlsplit(path)
+        query = parse_qs(parts.query)
+        try:
+            pn = int(query.get('pn', ['0'])[0])
+        except ValueError:
+            return 400, b'Bad Request'
+        if parts.path == '/f':
+            return 200, self.list_page(pn // 50 + 1)
+        match = _THREAD_PATH_RE.match(parts.path)
+        if match:
+            body = self.thread_page(int(match.group(1)), max(pn, 1))
+            if body is not None:
+                return 200, body
+        return 404, b'Not Found'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        site = self.server.site
+        delay = site.delay()
+        if delay:
+            time.sleep(delay)
+        status, body = site.respond(self.path)
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """在后台线程中运行 FixtureSite，可用作上下文管理器；port=0 时自动选择空闲端口"""
+
+    def __init__(self, site=None, host='127.0.0.1', port=0):
+        self.site = site or FixtureSite()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.site = self.site
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='tieba-fixture-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地贴吧替身服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--forum', default='华东师范大学')
+    parser.add_argument('--pages', type=int, default=10, help='语料中的列表页数')
+    parser.add_argument('--threads-per-page', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机附加延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--anti-bot-rate', type=float, default=0.0)
+    parser.add_argument('--recorded-dir', default=None, help='录制的列表页目录（list_page_<页码>.html）')
+    args = parser.parse_args()
+
+    site = FixtureSite(args.forum, total_pages=args.pages, threads_per_page=args.threads_per_page,
+                       latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       error_status=args.error_status, anti_bot_rate=args.anti_bot_rate,
+                       recorded_dir=args.recorded_dir)
+    server = FixtureServer(site, host=args.host, port=args.port)
+    print(f"贴吧替身服务器已启动: {server.url}  （Ctrl-C 退出）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"共处理 {site.requests} 个请求，注入错误 {site.injected} 次")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""按贴吧真实页面结构生成确定性的测试页面，用于基准测试与本地回放"""
+import json
+import random
+from html import escape
+from urllib.parse import quote
+
+_WORDS = ['考研', '食堂', '宿舍', '图书馆', '选课', '期末', '保研', '社团', '实习', '校园卡',
+          '二手', '求助', '吐槽', '分享', '讨论', '推荐', '避雷', '开学', '毕业', '老师']
+
+
+def _sentence(rng, min_words=4, max_words=12):
+    return '，'.join(rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def thread_id(forum, page_num, index):
+    """同一贴吧、页码、序号总是得到同一个帖子 ID"""
+    return 7000000000 + (sum(map(ord, forum)) % 1000) * 1000000 + page_num * 100 + index
+
+
+def make_list_page(forum, page_num, threads_per_page=50, total_pages=10, seed=0):
+    """生成一页帖子列表，帖子列表像真实页面一样藏在 <code><!-- --></code> 中"""
+    rng = random.Random(f"{seed}:{forum}:{page_num}")
+    items = []
+    for index in range(threads_per_page):
+        tid = thread_id(forum, page_num, index)
+        author = f"user_{rng.randint(1, 5000)}"
+        replies = rng.choice([0, 0, 1, 2, 5, 12, 40, 130, 800])
+        data_field = escape(json.dumps({'id': tid, 'author_name': author, 'reply_num': replies}), quote=True)
+        items.append(
+            f'<li class=" j_thread_list clearfix thread_item_box" data-field="{data_field}">'
+            f'<div class="t_con cleafix">'
+            f'<div class="col2_left j_threadlist_li_left">'
+            f'<span class="threadlist_rep_num center_text" title="回复">{replies}</span></div>'
+            f'<div class="col2_right j_threadlist_li_right"><div class="threadlist_lz clearfix">'
+            f'<div class="threadlist_title pull_left j_th_tit">'
+            f'<a rel="noopener" href="/p/{tid}" title="{escape(_sentence(rng, 2, 5))}" target="_blank" '
+            f'class="j_th_tit ">{escape(_sentence(rng, 2, 5))}</a></div>'
+            f'<div class="threadlist_author pull_right">'
+            f'<span class="tb_icon_author " title="主题作者: {author}"><i class="icon_author"></i>'
+            f'<span class="frs-author-name-wrap"><a class="frs-author-name j_user_card" '
+            f'href="/home/main?un={author}">{author}</a></span></span></div></div>'
+            f'<div class="threadlist_detail clearfix">'
+            f'<div class="threadlist_abs threadlist_abs_onlyline">{escape(_sentence(rng))}</div></div>'
+            f'</div></div></li>'
+        )
+    last_pn = (total_pages - 1) * 50
+    return (
+        '<!DOCTYPE html><html><head><meta charset="UTF-8">'
+        f'<title>{escape(forum)}吧-百度贴吧</title></head><body>'
+        '<div id="content"><div class="content_leftList clearfix">'
+        '<code class="pagelet_html" id="pagelet_html_frs-list/pagelet/thread_list" style="display:none;"><!--'
+        f'<ul id="thread_list" class="threadlist_bright j_threadlist_bright">{"".join(items)}</ul>'
+        f'<div class="th_footer_1"><a href="/f?kw={quote(forum)}&ie=utf-8&pn={last_pn}" class="last">尾页</a></div>'
+        '--></code></div></div></body></html>'
+    )
+
+
+# 帖子页每页楼层数，与贴吧一致
+FLOORS_PER_PAGE = 30
+
+
+def thread_reply_count(tid, seed=0):
+    """帖子的回复数（不含 1 楼），由帖子 ID 确定"""
+    rng = random.Random(f"{seed}:replies:{tid}")
+    return rng.choice([0, 0, 1, 2, 5, 12, 40, 130, 800])
+
+
+def thread_page_count(tid, seed=0):
+    return (thread_reply_count(tid, seed) + 1 + FLOORS_PER_PAGE - 1) // FLOORS_PER_PAGE
+
+
+def make_thread_page(tid, page_num=1, seed=0):
+    """生成帖子页的第 page_num 页，结构与真实帖子页相同，正文直接在静态 HTML 中"""
+    total_floors = thread_reply_count(tid, seed) + 1
+    total_pages = thread_page_count(tid, seed)
+    first_floor = (page_num - 1) * FLOORS_PER_PAGE + 1
+    posts = []
+    for floor in range(first_floor, min(total_floors, first_floor + FLOORS_PER_PAGE - 1) + 1):
+        rng = random.Random(f"{seed}:{tid}:{floor}")
+        author = f"user_{rng.randint(1, 5000)}"
+        date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+        data_field = escape(json.dumps({'author': {'user_name': author},
+                                        'content': {'post_no': floor, 'date': date}}), quote=True)
+        posts.append(
+            f'<div class="l_post j_l_post l_post_bright" data-field="{data_field}">'
+            f'<div class="d_author"><ul class="p_author"><li class="d_name">'
+            f'<a class="p_author_name j_user_card" href="/home/main?un={author}">{author}</a></li></ul></div>'
+            f'<div class="d_post_content_main"><div class="p_content">'
+            f'<div id="post_content_{tid}{floor}" class="d_post_content j_d_post_content">'
+            f'{escape(_sentence(rng, 6, 30))}</div></div>'
+            f'<div class="core_reply j_lzl_wrapper"><div class="core_reply_tail">'
+            f'<div class="post-tail-wrap"><span class="tail-info">{floor}楼</span>'
+            f'<span class="tail-info">{date}</span></div></div></div></div></div>'
+        )
+    pager = ''.join(f'<a href="/p/{tid}?pn={pn}">{pn}</a>' for pn in range(1, total_pages + 1) if pn != page_num)
+    return (
+        '<!DOCTYPE html><html><head><meta charset="UTF-8">'
+        f'<title>帖子 {tid}-百度贴吧</title></head><body>'
+        f'<div class="l_thread_info"><ul class="l_posts_num"><li class="l_pager pager_theme_4 pb_list_pager">{pager}</li>'
+        f'<li class="l_reply_num"><span class="red">{total_floors - 1}</span>回复贴，共'
+        f'<span class="red">{total_pages}</span>页</li></ul></div>'
+        f'<div class="p_postlist" id="j_p_postlist">{"".join(posts)}</div></body></html>'
+    )
+
+
+# 贴吧正文中常混入的无效文本，用于生成清洗基准的合成帖子
+_BOILERPLATE = ['点击展开，查看完整图片', '快捷键说明', '播放出现小问题，请刷新重试']
+
+
+def make_post(index, seed=0):
+    """生成一条与 TiebaSpider 输出字段相同的合成帖子，约三成正文混有无效文本、一成过短"""
+    rng = random.Random(f"{seed}:post:{index}")
+    tid = 7000000000 + index
+    roll = rng.random()
+    if roll < 0.1:
+        content = rng.choice(['', '顶', '沙发', '+1'])
+    else:
+        content = _sentence(rng, 5, 60)
+        if roll < 0.4:
+            content = f"{rng.choice(_BOILERPLATE)}\n{content}" if rng.random() < 0.5 else f"{content}  {rng.choice(_BOILERPLATE)}"
+    return {
+        'title': _sentence(rng, 2, 6),
+        'author': f"user_{rng.randint(1, 50000)}",
+        'reply_count': str(rng.choice([0, 1, 2, 5, 12, 40, 130, 800])),
+        'content': content[:500],
+        'post_url': f"https://tieba.baidu.com/p/{tid}",
+        'crawl_time': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00",
+    }
@@ -9,6 +9,21 @@ RAW_DATA_DIR = DATA_DIR / "raw"
 CLEANED_DATA_DIR = DATA_DIR / "cleaned"
 MAXKB_DOCS_DIR = DATA_DIR / "maxkb_docs"
 
+# 增量抓取用的帖子索引（SQLite）
+THREAD_INDEX_PATH = RAW_DATA_DIR / "thread_index.db"
+
+# 近似去重用的 SimHash 指纹索引（SQLite），记录所有已入库帖子
+DEDUP_INDEX_PATH = CLEANED_DATA_DIR / "simhash_index.db"
+
+# 增量清洗清单（SQLite）：已清洗记录的内容哈希和清洗器版本
+CLEANING_MANIFEST_PATH = CLEANED_DATA_DIR / "cleaning_manifest.db"
+
+# 部分上传失败时等待重新上传的文档列表（它们所属的批次已确认，不会再重新生成）
+PENDING_UPLOADS_PATH = MAXKB_DOCS_DIR / "pending_uploads.json"
+
+# 清洗语料的列式存储（Parquet，按贴吧和抓取日期分区，需要可选依赖 pyarrow）
+CORPUS_STORE_DIR = DATA_DIR / "corpus"
+
 # 确保目录存在
 for dir_path in [DATA_DIR, RAW_DATA_DIR, CLEANED_DATA_DIR, MAXKB_DOCS_DIR]:
     dir_path.mkdir(parents=True, exist_ok=True)
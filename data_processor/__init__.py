@@ -1,5 +1,10 @@
 
-from .cleaner import clean_tieba_data
+from .cleaner import clean_tieba_data, parallel_clean_tieba_data, stream_clean_tieba_data
+from .columnar import CorpusStore
+from .dedup import SimHashIndex, dedup_tieba_data
+from .manifest import CleaningManifest
+from .rules import CleaningRules
 from .txt_converter import convert_cleaned_json_to_txt  
 
-__all__ = ['clean_tieba_data', 'convert_cleaned_json_to_txt']
\ No newline at end of file
+__all__ = ['clean_tieba_data', 'stream_clean_tieba_data', 'parallel_clean_tieba_data', 'CleaningRules',
+           'CleaningManifest', 'CorpusStore', 'dedup_tieba_data', 'SimHashIndex', 'convert_cleaned_json_to_txt']
\ No newline at end of file
@@ -1,38 +1,177 @@
 
+import argparse
 import json
-import re
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
-def clean_tieba_data(raw_json_path, output_json_path):
+from .columnar import CorpusStore
+from .manifest import CleaningManifest
+from .record_io import RecordWriter, format_record, is_jsonl, iter_record_chunks, iter_records, load_chunk
+from .rules import load_rules
+
+
+def clean_post(post, rules=None):
+    """清洗单条帖子：合并标题和内容，去除无效文本和多余空白，没有实质内容时返回 None"""
+    return (rules or load_rules()).clean_post(post)
+
+
+def clean_tieba_data(raw_json_path, output_json_path, rules_path=None, store_path=None, forum=None,
+                     manifest_path=None, batch_id=None):
+    """清洗原始数据并保存为 JSON 数组；指定 store_path 时同时把结果追加到该贴吧的列式存储（需要 pyarrow）
+
+    指定 manifest_path 时只清洗清单中没有的新记录或内容有变化的记录（见 manifest.CleaningManifest）；
+    同时指定 batch_id 时登记要等 CleaningManifest.confirm(batch_id) 后才生效。
+    """
     
     with open(raw_json_path, 'r', encoding='utf-8') as f:
         raw_posts = json.load(f)
     
-    cleaned_posts = []
-    for post in raw_posts:
-        # 1. 合并标题和内容作为最终分析文本
-        combined_text = f"标题：{post.get('title', '')}\n内容：{post.get('content', '')}"
-        
-        # 2. 清洗掉“点击展开，查看完整图片”等无效文本
-        cleaned_text = re.sub(r'点击展开，查看完整图片|快捷键说明|播放出现小问题.*', '', combined_text)
+    rules = load_rules(rules_path)
+    with _open_manifest(manifest_path, rules, batch_id) as manifest:
+        posts = manifest.select_new(raw_posts) if manifest is not None else raw_posts
+        cleaned_posts = []
+        for post in posts:
+            cleaned_post = rules.clean_post(post)
+            if cleaned_post is not None:
+                cleaned_posts.append(cleaned_post)
         
-        # 3. 去除过多空白字符
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
-        
-        # 4. 只保留有实质内容的帖子
-        if len(cleaned_text) > 20:
-            cleaned_post = {
-                # 保留原始字段用于追溯
-                'original_title': post.get('title', ''),
-                'original_author': post.get('author', ''),
-                # 清洗后的核心字段，用于构建知识库
-                'cleaned_text': cleaned_text,
-                'crawl_time': post.get('crawl_time', '')
-            }
-            cleaned_posts.append(cleaned_post)
-    
-    # 保存清洗后的数据
-    with open(output_json_path, 'w', encoding='utf-8') as f:
-        json.dump(cleaned_posts, f, ensure_ascii=False, indent=2)
+        # 保存清洗后的数据
+        with open(output_json_path, 'w', encoding='utf-8') as f:
+            json.dump(cleaned_posts, f, ensure_ascii=False, indent=2)
+        if store_path is not None:
+            with _corpus_writer(store_path, forum) as store_writer:
+                store_writer.write_batch(cleaned_posts)
+        # 输出都写完后才提交清单，中途失败时这些记录下次仍会被清洗
+        if manifest is not None:
+            manifest.commit()
     
-    print(f"[✅] 数据清洗完成。原始帖子数：{len(raw_posts)}，清洗后有效帖子数：{len(cleaned_posts)}")
-    return output_json_path
\ No newline at end of file
+    print(f"[✅] 数据清洗完成。原始帖子数：{len(raw_posts)}，清洗后有效帖子数：{len(cleaned_posts)}"
+          + _skipped_note(len(raw_posts) - len(posts), manifest))
+    return output_json_path
+
+
+def _open_manifest(manifest_path, rules, batch_id=None):
+    if manifest_path is None:
+        return nullcontext()
+    manifest = CleaningManifest(manifest_path, rules.version, batch_id)
+    if manifest.invalidated:
+        print(f"[INFO] 清洗器版本变为 {rules.version}，清单中 {manifest.invalidated} 条旧记录已作废")
+    return manifest
+
+
+def _skipped_note(skipped, manifest):
+    return f"，跳过已处理记录：{skipped}" if manifest is not None else ""
+
+
+def _corpus_writer(store_path, forum):
+    if not forum:
+        raise ValueError("写入列式存储时必须指定贴吧名 forum")
+    return CorpusStore(store_path).writer(forum)
+
+
+def stream_clean_tieba_data(raw_path, output_path, progress_every=100000, rules_path=None, batch_size=5000,
+                            store_path=None, forum=None, manifest_path=None, batch_id=None):
+    """流式清洗：逐块读取原始记录、逐条写出，内存占用与文件大小无关
+
+    raw_path 可以是 JSONL（.jsonl/.jsonl.gz）或 JSON 数组文件；output_path 以 .jsonl 结尾时
+    输出 JSONL，否则输出与 clean_tieba_data 相同格式的 JSON 数组。
+    每 batch_size 条记录用规则引擎批量清洗一次；大约每处理 progress_every 条打印一次进度。
+    指定 store_path 时清洗结果同时追加到 forum 的列式存储（见 columnar.CorpusStore）；
+    指定 manifest_path 时跳过清单中已处理且内容没有变化的记录，耗时只与新数据量成正比；
+    batch_id 的含义与 clean_tieba_data 相同。
+    """
+    rules = load_rules(rules_path)
+    start_time = time.perf_counter()
+    total = kept = skipped = 0
+    next_report = progress_every
+    records = iter_records(raw_path)
+    store_writer = _corpus_writer(store_path, forum) if store_path is not None else None
+    with _open_manifest(manifest_path, rules, batch_id) as manifest:
+        with RecordWriter(output_path) as writer, (store_writer or nullcontext()):
+            for batch in iter(lambda: list(islice(records, batch_size)), []):
+                total += len(batch)
+                if manifest is not None:
+                    new_posts = manifest.select_new(batch)
+                    skipped += len(batch) - len(new_posts)
+                    batch = new_posts
+                cleaned = rules.clean_batch(batch)
+                for cleaned_post in cleaned:
+                    writer.write(cleaned_post)
+                kept += len(cleaned)
+                if store_writer is not None:
+                    store_writer.write_batch(cleaned)
+                if progress_every and total >= next_report:
+                    next_report += progress_every
+                    elapsed = time.perf_counter() - start_time
+                    print(f"    已处理 {total} 条，{total / elapsed:.0f} 条/秒")
+        if manifest is not None:
+            manifest.commit()
+
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    size_mb = os.path.getsize(raw_path) / (1024 * 1024)
+    print(f"[✅] 数据清洗完成。原始帖子数：{total}，清洗后有效帖子数：{kept}，"
+          f"耗时 {elapsed:.2f} 秒（{total / elapsed:.0f} 条/秒，{size_mb / elapsed:.1f} MB/秒）"
+          + _skipped_note(skipped, manifest))
+    return output_path
+
+
+def _clean_chunk(chunk, rules_path, jsonl):
+    """子进程中执行：解析、清洗并格式化一块记录，返回 (输入条数, 格式化后的输出列表)"""
+    records = load_chunk(chunk)
+    cleaned = load_rules(rules_path).clean_batch(records)
+    return len(records), [format_record(post, jsonl) for post in cleaned]
+
+
+def parallel_clean_tieba_data(raw_paths, output_path, workers=None, chunk_size=20000, rules_path=None):
+    """多进程清洗：把一个或多个原始文件切成块，在进程池中并行清洗后按原顺序合并写出
+
+    块按输入顺序提交、按提交顺序取回结果，输出与 stream_clean_tieba_data 逐字节相同，
+    与 workers 数量无关。同时在途的块不超过 workers * 2 个，内存占用与输入总量无关。
+    """
+    if isinstance(raw_paths, (str, os.PathLike)):
+        raw_paths = [raw_paths]
+    workers = workers or os.cpu_count() or 1
+    jsonl = is_jsonl(output_path)
+    start_time = time.perf_counter()
+    total = kept = 0
+    chunks = (chunk for path in raw_paths for chunk in iter_record_chunks(path, chunk_size))
+
+    with RecordWriter(output_path) as writer, ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_clean_chunk, chunk, rules_path, jsonl))
+            if len(pending) < workers * 2:
+                continue
+            count, items = pending.popleft().result()
+            writer.write_formatted(items)
+            total, kept = total + count, kept + len(items)
+        while pending:
+            count, items = pending.popleft().result()
+            writer.write_formatted(items)
+            total, kept = total + count, kept + len(items)
+
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    size_mb = sum(os.path.getsize(path) for path in raw_paths) / (1024 * 1024)
+    print(f"[✅] 数据清洗完成（{workers} 个进程，{len(raw_paths)} 个文件）。原始帖子数：{total}，"
+          f"清洗后有效帖子数：{kept}，耗时 {elapsed:.2f} 秒（{total / elapsed:.0f} 条/秒，{size_mb / elapsed:.1f} MB/秒）")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量清洗贴吧原始数据（JSON 数组或 JSONL）")
+    parser.add_argument('raw_paths', nargs='+', help='原始数据文件，按给出的顺序合并')
+    parser.add_argument('-o', '--output', required=True, help='输出文件，.jsonl 结尾时输出 JSONL')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认等于 CPU 核数')
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--rules', default=None, help='清洗规则文件')
+    args = parser.parse_args()
+    parallel_clean_tieba_data(args.raw_paths, args.output, workers=args.workers,
+                              chunk_size=args.chunk_size, rules_path=args.rules)
+
+
+if __name__ == '__main__':
+    main()
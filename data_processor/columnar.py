@@ -0,0 +1,185 @@
+import re
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+# 清洗结果的列，全部为字符串；forum 和 date 是分区列，只出现在目录名中
+COLUMNS = ('original_title', 'original_author', 'cleaned_text', 'crawl_time')
+UNKNOWN_DATE = 'unknown'
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _require_pyarrow():
+    """pyarrow 是可选依赖，只有使用列式存储时才需要"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("列式存储需要 pyarrow，请先安装：pip install pyarrow") from e
+    return pyarrow
+
+
+def crawl_date(record):
+    """从 crawl_time（"YYYY-MM-DD HH:MM:SS"）取出日期分区，格式不对时归入 unknown"""
+    crawl_time = record.get('crawl_time') or ''
+    return crawl_time[:10] if _DATE_RE.match(crawl_time) else UNKNOWN_DATE
+
+
+class CorpusWriter:
+    """向 CorpusStore 追加一个贴吧的清洗结果：按抓取日期分组缓存，攒够 rows_per_file 条写出一个文件
+
+    每个文件内按作者排序，row group 的 min/max 统计因此比较紧凑，按作者过滤时可以跳过
+    整个 row group。只会新建文件，不修改已有文件。
+    """
+
+    def __init__(self, store, forum, rows_per_file=200000, row_group_size=20000):
+        self.pa = _require_pyarrow()
+        self.store = store
+        self.forum = forum
+        self.rows_per_file = rows_per_file
+        self.row_group_size = row_group_size
+        self.count = 0
+        self.files = []
+        self._buffers = {}
+        self._token = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+
+    def write(self, record):
+        partition_date = crawl_date(record)
+        buffer = self._buffers.setdefault(partition_date, [])
+        buffer.append(record)
+        self.count += 1
+        if len(buffer) >= self.rows_per_file:
+            self._flush(partition_date)
+
+    def write_batch(self, records):
+        for record in records:
+            self.write(record)
+
+    def _flush(self, partition_date):
+        import pyarrow.parquet as pq
+
+        records = self._buffers.pop(partition_date, None)
+        if not records:
+            return
+        records.sort(key=lambda record: record.get('original_author') or '')
+        table = self.pa.table({column: [record.get(column) or '' for record in records] for column in COLUMNS},
+                              schema=self.store.schema)
+        partition_dir = self.store.partition_dir(self.forum, partition_date)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        path = partition_dir / f"part-{self._token}-{len(self.files):05d}.parquet"
+        tmp_path = path.with_name(path.name + '.tmp')
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size, compression='zstd')
+        # 写完再改名，读取方不会看到写了一半的文件
+        tmp_path.replace(path)
+        self.files.append(path)
+
+    def close(self):
+        for partition_date in list(self._buffers):
+            self._flush(partition_date)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        # 出错时丢弃尚未写出的缓存，已写出的文件都是完整的
+        if exc_type is None:
+            self.close()
+        else:
+            self._buffers.clear()
+
+
+class CorpusStore:
+    """只追加的清洗语料列式存储（Parquet），目录按 Hive 风格分区：<root>/forum=<贴吧>/date=<抓取日期>/
+
+    读取时先按目录名筛选贴吧和日期范围，只有选中的分区会被打开；作者过滤下推到 Parquet 扫描，
+    利用 row group 统计跳过不相关的数据。贴吧名在目录名中按 URI 编码。
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @property
+    def schema(self):
+        pa = _require_pyarrow()
+        return pa.schema([(column, pa.string()) for column in COLUMNS])
+
+    def partition_dir(self, forum, partition_date):
+        return self.root / f"forum={quote(forum, safe='')}" / f"date={partition_date}"
+
+    def writer(self, forum, **kwargs):
+        return CorpusWriter(self, forum, **kwargs)
+
+    def append(self, records, forum, **kwargs):
+        """追加一批记录，返回写入条数"""
+        with self.writer(forum, **kwargs) as writer:
+            writer.write_batch(records)
+        return writer.count
+
+    def forums(self):
+        if not self.root.exists():
+            return []
+        return sorted(unquote(path.name[len('forum='):]) for path in self.root.glob('forum=*') if path.is_dir())
+
+    def partitions(self, forum=None, start_date=None, end_date=None):
+        """按目录名筛选分区，返回 [(贴吧, 日期, 目录)]；日期为 "YYYY-MM-DD"，范围两端都包含
+
+        指定日期范围时不包含 unknown 分区。
+        """
+        forums = [forum] if isinstance(forum, str) else (forum or self.forums())
+        selected = []
+        for name in forums:
+            forum_dir = self.root / f"forum={quote(name, safe='')}"
+            if not forum_dir.is_dir():
+                continue
+            for date_dir in sorted(forum_dir.glob('date=*')):
+                partition_date = date_dir.name[len('date='):]
+                if start_date or end_date:
+                    if partition_date == UNKNOWN_DATE:
+                        continue
+                    if ((start_date and partition_date < str(start_date))
+                            or (end_date and partition_date > str(end_date))):
+                        continue
+                selected.append((name, partition_date, date_dir))
+        return selected
+
+    def dataset(self, forum=None, start_date=None, end_date=None):
+        """只由选中分区中的文件组成的 pyarrow Dataset，分区列 forum/date 从路径中解析"""
+        pa = _require_pyarrow()
+        import pyarrow.dataset as ds
+
+        files = [str(path) for _, _, partition in self.partitions(forum, start_date, end_date)
+                 for path in sorted(partition.glob('*.parquet'))]
+        partition_schema = pa.schema([('forum', pa.string()), ('date', pa.string())])
+        # Hive 分区默认按 URI 解码目录名中的值
+        partitioning = ds.HivePartitioning(partition_schema)
+        schema = pa.schema(list(self.schema) + list(partition_schema))
+        return ds.dataset(files, schema=schema, format='parquet', partitioning=partitioning,
+                          partition_base_dir=str(self.root))
+
+    @staticmethod
+    def _author_filter(authors):
+        if authors is None:
+            return None
+        import pyarrow.dataset as ds
+
+        authors = [authors] if isinstance(authors, str) else list(authors)
+        return ds.field('original_author').isin(authors)
+
+    def read(self, forum=None, start_date=None, end_date=None, authors=None, columns=None):
+        """读取为 pyarrow.Table；authors 为作者名或作者名列表，columns 为要读取的列（默认全部）"""
+        dataset = self.dataset(forum, start_date, end_date)
+        return dataset.to_table(columns=columns, filter=self._author_filter(authors))
+
+    def read_recent(self, forum, days=30, authors=None, columns=None):
+        """读取某个贴吧最近 days 天（含今天）抓取的帖子"""
+        start_date = (date.today() - timedelta(days=days - 1)).isoformat()
+        return self.read(forum, start_date=start_date, authors=authors, columns=columns)
+
+    def iter_records(self, forum=None, start_date=None, end_date=None, authors=None, columns=None):
+        """按批读取并逐条给出字典，内存中只保留一批"""
+        dataset = self.dataset(forum, start_date, end_date)
+        for batch in dataset.to_batches(columns=columns, filter=self._author_filter(authors)):
+            yield from batch.to_pylist()
@@ -0,0 +1,272 @@
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+from .record_io import RecordWriter, iter_records
+
+FINGERPRINT_BITS = 64
+_SIGN_BIT = 1 << (FINGERPRINT_BITS - 1)
+# 字符 n-gram 滚动哈希的乘数（任取的奇数），结果再经 splitmix64 混合使各位分布均匀
+_SHINGLE_PRIME = 0x100000001B3
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+
+
+def simhash(text, shingle_size=3):
+    """计算文本的 64 位 SimHash 指纹：字符 n-gram 逐个哈希，按位投票（出现多次的 n-gram 按次数计权）
+
+    哈希只依赖文本本身，不受 PYTHONHASHSEED 影响，指纹可以跨进程、跨运行比较。
+    """
+    import numpy as np
+
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    count = max(len(codes) - shingle_size + 1, 1)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for i in range(min(shingle_size, len(codes))):
+        # uint64 数组运算按 2^64 取模回绕
+        hashes = hashes * np.uint64(_SHINGLE_PRIME) + codes[i:i + count]
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(_MIX1)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(_MIX2)
+    hashes ^= hashes >> np.uint64(31)
+    # 每个哈希展开成 64 个比特（小端字节序下第 k 个比特即指纹的第 k 位），统计每一位为 1 的票数
+    bits = np.unpackbits(hashes.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64)
+    return int.from_bytes(np.packbits(votes * 2 > count, bitorder='little').tobytes(), 'little')
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _to_signed(fingerprint):
+    """SQLite 的 INTEGER 是有符号 64 位，指纹按补码存储"""
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint & _SIGN_BIT else fingerprint
+
+
+def _to_unsigned(value):
+    return value + (1 << FINGERPRINT_BITS) if value < 0 else value
+
+
+class SimHashIndex:
+    """持久化的 SimHash 近似重复索引（SQLite），跨运行累积所有已入库帖子的指纹
+
+    指纹切成 bands 段，每段单独建索引：汉明距离不超过 max_distance 的两个指纹
+    至少有一段完全相同（抽屉原理，要求 bands > max_distance），所以查找只需比较
+    与某一段相同的候选，而不是扫描全部指纹。每次去重记为一次运行（runs 表），
+    保存处理条数和重复条数，便于回看各次的去重率。
+
+    带 batch_id 的运行先处于待确认状态：它的指纹只对本次运行可见，confirm(batch_id)
+    之后才对其他运行生效，discard(batch_id) 则连同运行记录一起删除。
+    """
+
+    def __init__(self, db_path, bands=4, max_distance=3):
+        if FINGERPRINT_BITS % bands:
+            raise ValueError(f"bands 必须能整除 {FINGERPRINT_BITS}")
+        if max_distance >= bands:
+            raise ValueError("max_distance 必须小于 bands，否则分段查找会漏掉近似重复")
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = str(db_path)
+        self.bands = bands
+        self.max_distance = max_distance
+        self.band_bits = FINGERPRINT_BITS // bands
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY,"
+            " source TEXT NOT NULL,"
+            " started_at TEXT NOT NULL,"
+            " total INTEGER NOT NULL DEFAULT 0,"
+            " duplicates INTEGER NOT NULL DEFAULT 0,"
+            " batch_id TEXT,"
+            " confirmed INTEGER NOT NULL DEFAULT 1);"
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " id INTEGER PRIMARY KEY,"
+            " fingerprint INTEGER NOT NULL,"
+            " run_id INTEGER NOT NULL,"
+            " title TEXT NOT NULL,"
+            " crawl_time TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS bands ("
+            " band INTEGER NOT NULL,"
+            " value INTEGER NOT NULL,"
+            " fingerprint_id INTEGER NOT NULL,"
+            " PRIMARY KEY (band, value, fingerprint_id)) WITHOUT ROWID;"
+        )
+        self._check_layout()
+
+    def _check_layout(self):
+        """分段方式写入 meta 表，之后打开同一个索引必须使用相同的分段数"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'bands'").fetchone()
+        if row is None:
+            with self.conn:
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('bands', ?)", (str(self.bands),))
+        elif int(row[0]) != self.bands:
+            raise ValueError(f"索引 {self.db_path} 按 {row[0]} 段建立，不能以 {self.bands} 段打开")
+
+    def _band_values(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(band, (fingerprint >> (band * self.band_bits)) & mask) for band in range(self.bands)]
+
+    def find(self, fingerprint, run_id=None):
+        """查找汉明距离不超过 max_distance 的已有指纹，返回 (指纹ID, 所属运行ID)，没有时返回 None
+
+        只比较已确认运行的指纹，以及 run_id 指定的当前运行自己的指纹。
+        """
+        seen = set()
+        for band, value in self._band_values(fingerprint):
+            rows = self.conn.execute(
+                "SELECT f.id, f.fingerprint, f.run_id FROM bands b"
+                " JOIN fingerprints f ON f.id = b.fingerprint_id JOIN runs r ON r.id = f.run_id"
+                " WHERE b.band = ? AND b.value = ? AND (r.confirmed = 1 OR r.id = ?)",
+                (band, value, run_id)
+            )
+            for fingerprint_id, stored, row_run_id in rows:
+                if fingerprint_id in seen:
+                    continue
+                seen.add(fingerprint_id)
+                if hamming_distance(fingerprint, _to_unsigned(stored)) <= self.max_distance:
+                    return fingerprint_id, row_run_id
+        return None
+
+    def add(self, fingerprint, run_id, title='', crawl_time=''):
+        cursor = self.conn.execute(
+            "INSERT INTO fingerprints (fingerprint, run_id, title, crawl_time) VALUES (?, ?, ?, ?)",
+            (_to_signed(fingerprint), run_id, title or '', crawl_time or '')
+        )
+        fingerprint_id = cursor.lastrowid
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO bands (band, value, fingerprint_id) VALUES (?, ?, ?)",
+            [(band, value, fingerprint_id) for band, value in self._band_values(fingerprint)]
+        )
+        return fingerprint_id
+
+    def start_run(self, source, batch_id=None):
+        """开始一次运行；指定 batch_id 时运行处于待确认状态"""
+        cursor = self.conn.execute(
+            "INSERT INTO runs (source, started_at, batch_id, confirmed) VALUES (?, ?, ?, ?)",
+            (str(source), time.strftime("%Y-%m-%d %H:%M:%S"), batch_id, int(batch_id is None))
+        )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id, total, duplicates):
+        self.conn.execute("UPDATE runs SET total = ?, duplicates = ? WHERE id = ?", (total, duplicates, run_id))
+        self.conn.commit()
+
+    def confirm(self, batch_id):
+        """数据入库（上传成功）后确认批次，其指纹从此参与后续运行的查找；返回确认的运行数"""
+        with self.conn:
+            return self.conn.execute("UPDATE runs SET confirmed = 1 WHERE batch_id = ? AND confirmed = 0",
+                                     (batch_id,)).rowcount
+
+    def discard(self, batch_id):
+        """丢弃未确认的批次（上传失败），删除其运行记录和指纹；返回删除的运行数"""
+        pending = "SELECT id FROM runs WHERE batch_id = ? AND confirmed = 0"
+        with self.conn:
+            self.conn.execute(f"DELETE FROM bands WHERE fingerprint_id IN"
+                              f" (SELECT id FROM fingerprints WHERE run_id IN ({pending}))", (batch_id,))
+            self.conn.execute(f"DELETE FROM fingerprints WHERE run_id IN ({pending})", (batch_id,))
+            return self.conn.execute(f"DELETE FROM runs WHERE id IN ({pending})", (batch_id,)).rowcount
+
+    def runs(self):
+        """已确认的各次运行的 (运行ID, 来源, 开始时间, 处理条数, 重复条数)，按时间顺序"""
+        return self.conn.execute("SELECT id, source, started_at, total, duplicates FROM runs"
+                                 " WHERE confirmed = 1 ORDER BY id").fetchall()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def dedup_tieba_data(cleaned_path, output_path, index_path, mode='drop', max_distance=3, bands=4,
+                     shingle_size=3, batch_id=None):
+    """近似去重：为每条清洗结果的 cleaned_text 计算 SimHash，与索引中已有的指纹比较
+
+    与本次之前各次运行入库的帖子近似重复时直接丢弃（知识库中已有）；本次内部的近似重复
+    在 mode='drop' 时丢弃，mode='merge' 时只保留第一条并在其 duplicate_count 字段记下
+    合并掉的条数（需要读两遍输入）。保留下来的帖子指纹写入索引，整次运行在一个事务中
+    提交，失败时索引不会留下半次运行的指纹。
+
+    指定 batch_id 时保留的指纹只是暂存：上传成功后调用 SimHashIndex.confirm(batch_id)
+    才算入库，上传失败时调用 discard(batch_id)，这些帖子下次仍会被保留并重新上传。
+    """
+    if mode not in ('drop', 'merge'):
+        raise ValueError(f"未知的去重模式: {mode}")
+    total = within_run = historical = 0
+    merged = {}  # mode='merge' 时：保留帖子的记录序号 -> 合并掉的条数
+    keep = []
+    with SimHashIndex(index_path, bands=bands, max_distance=max_distance) as index:
+        try:
+            run_id = index.start_run(cleaned_path, batch_id)
+            first_of = {}  # 本次运行中的指纹ID -> 对应保留帖子的记录序号
+            for position, record in enumerate(iter_records(cleaned_path)):
+                total += 1
+                fingerprint = simhash(record.get('cleaned_text', ''), shingle_size)
+                match = index.find(fingerprint, run_id)
+                if match is None:
+                    fingerprint_id = index.add(fingerprint, run_id, record.get('original_title'),
+                                               record.get('crawl_time'))
+                    first_of[fingerprint_id] = position
+                    keep.append(True)
+                elif match[1] == run_id:
+                    within_run += 1
+                    merged[first_of[match[0]]] = merged.get(first_of[match[0]], 0) + 1
+                    keep.append(False)
+                else:
+                    historical += 1
+                    keep.append(False)
+            index.finish_run(run_id, total, within_run + historical)
+        except BaseException:
+            index.conn.rollback()
+            raise
+
+    # 第二遍只写出保留的帖子；keep 每条只占一个列表槽位，不保存记录本身
+    with RecordWriter(output_path) as writer:
+        for position, record in enumerate(iter_records(cleaned_path)):
+            if keep[position]:
+                if mode == 'merge':
+                    record['duplicate_count'] = merged.get(position, 0)
+                writer.write(record)
+
+    duplicates = within_run + historical
+    ratio = duplicates / total if total else 0.0
+    print(f"[✅] 近似去重完成。输入帖子数：{total}，保留：{total - duplicates}，"
+          f"本次内部重复：{within_run}，与历史重复：{historical}，去重率：{ratio:.1%}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于 SimHash 的近似重复帖子去重")
+    parser.add_argument('cleaned_path', nargs='?', help='清洗结果（JSON 数组或 JSONL）')
+    parser.add_argument('-o', '--output', help='去重结果路径，.jsonl 结尾时输出 JSONL')
+    parser.add_argument('--index', required=True, help='SimHash 索引数据库路径')
+    parser.add_argument('--mode', choices=('drop', 'merge'), default='drop')
+    parser.add_argument('--max-distance', type=int, default=3, help='视为近似重复的最大汉明距离')
+    parser.add_argument('--bands', type=int, default=4, help='指纹分段数，必须大于 max-distance')
+    parser.add_argument('--history', action='store_true', help='只打印索引中各次运行的去重率')
+    args = parser.parse_args()
+
+    if args.history:
+        with SimHashIndex(args.index, bands=args.bands, max_distance=args.max_distance) as index:
+            for run_id, source, started_at, total, duplicates in index.runs():
+                ratio = duplicates / total if total else 0.0
+                print(f"{run_id:>4}  {started_at}  {total:>8}  {duplicates:>8}  {ratio:>6.1%}  {source}")
+        return
+    if not args.cleaned_path or not args.output:
+        parser.error("需要指定清洗结果路径和 --output")
+    dedup_tieba_data(args.cleaned_path, args.output, args.index, mode=args.mode,
+                     max_distance=args.max_distance, bands=args.bands)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+# SQLite 单条语句的参数个数有上限（旧版本为 999），批量查询按此分组
+_QUERY_BATCH = 500
+
+
+def record_key(post):
+    """原始记录的标识：优先用帖子链接，没有链接时用标题和作者"""
+    post_url = post.get('post_url')
+    if post_url:
+        return post_url
+    return 'sha1:' + hashlib.sha1(f"{post.get('title', '')}\0{post.get('author', '')}".encode('utf-8')).hexdigest()
+
+
+def record_hash(post):
+    """参与清洗的字段的内容哈希；crawl_time 每次抓取都会变，不计入"""
+    text = f"{post.get('title', '')}\0{post.get('content', '')}\0{post.get('author', '')}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class CleaningManifest:
+    """增量清洗清单（SQLite）：记录每条原始记录的内容哈希和处理它的清洗器版本
+
+    select_new() 只返回新记录或内容有变化的记录，并把它们登记到清单；登记在 commit()
+    之前不会落盘，清洗失败时直接 close() 即可丢弃。打开清单时，版本与当前清洗器不同的
+    记录全部作废（规则或清洗逻辑改变后，所有记录都要重新清洗一遍）。
+
+    指定 batch_id 时登记先写入待确认区（pending 表），只对同一批次可见；数据上传成功后
+    confirm(batch_id) 才把它们转为已处理记录，discard(batch_id) 则丢弃，这些记录下次仍会
+    被清洗。只确认或丢弃批次时可以不指定 version。
+    """
+
+    def __init__(self, db_path, version=None, batch_id=None):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = str(db_path)
+        self.version = version
+        self.batch_id = batch_id
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " record_key TEXT PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " cleaner_version TEXT NOT NULL,"
+            " processed_at TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " batch_id TEXT NOT NULL,"
+            " record_key TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " cleaner_version TEXT NOT NULL,"
+            " processed_at TEXT NOT NULL,"
+            " PRIMARY KEY (batch_id, record_key));"
+        )
+        self.invalidated = 0
+        if version is not None:
+            self.invalidated = self.conn.execute("DELETE FROM records WHERE cleaner_version != ?",
+                                                 (version,)).rowcount
+            self.conn.execute("DELETE FROM pending WHERE cleaner_version != ?", (version,))
+            self.conn.commit()
+
+    def select_new(self, posts):
+        """返回 posts 中需要清洗的记录（顺序不变），同一批中重复出现的记录只返回第一条"""
+        keyed = [(record_key(post), record_hash(post), post) for post in posts]
+        known = {}
+        for start in range(0, len(keyed), _QUERY_BATCH):
+            keys = [key for key, _, _ in keyed[start:start + _QUERY_BATCH]]
+            placeholders = ','.join('?' * len(keys))
+            known.update(self.conn.execute(
+                f"SELECT record_key, content_hash FROM records WHERE record_key IN ({placeholders})", keys
+            ))
+            if self.batch_id is not None:
+                # 本批次之前已登记的记录（例如流式清洗的前几块）
+                known.update(self.conn.execute(
+                    f"SELECT record_key, content_hash FROM pending"
+                    f" WHERE batch_id = ? AND record_key IN ({placeholders})", [self.batch_id] + keys
+                ))
+        selected, rows = [], []
+        processed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        for key, content_hash, post in keyed:
+            if known.get(key) == content_hash:
+                continue
+            known[key] = content_hash
+            selected.append(post)
+            rows.append((key, content_hash, self.version, processed_at))
+        if self.batch_id is None:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO records (record_key, content_hash, cleaner_version, processed_at)"
+                " VALUES (?, ?, ?, ?)",
+                rows
+            )
+        else:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pending (batch_id, record_key, content_hash, cleaner_version, processed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(self.batch_id,) + row for row in rows]
+            )
+        return selected
+
+    def commit(self):
+        """登记落盘；指定了 batch_id 时只是写入待确认区"""
+        self.conn.commit()
+
+    def confirm(self, batch_id):
+        """数据上传成功后确认批次，把它的登记转为已处理记录；返回确认的条数"""
+        with self.conn:
+            confirmed = self.conn.execute(
+                "INSERT OR REPLACE INTO records (record_key, content_hash, cleaner_version, processed_at)"
+                " SELECT record_key, content_hash, cleaner_version, processed_at FROM pending WHERE batch_id = ?",
+                (batch_id,)
+            ).rowcount
+            self.conn.execute("DELETE FROM pending WHERE batch_id = ?", (batch_id,))
+        return confirmed
+
+    def discard(self, batch_id):
+        """丢弃批次的登记（上传失败），返回丢弃的条数"""
+        with self.conn:
+            return self.conn.execute("DELETE FROM pending WHERE batch_id = ?", (batch_id,)).rowcount
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        """关闭连接，未 commit 的登记被丢弃"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
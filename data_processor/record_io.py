@@ -0,0 +1,232 @@
+import gzip
+import json
+import re
+from itertools import islice
+from json.encoder import encode_basestring
+from pathlib import Path
+
+# 数组元素之间的空白和逗号
+_SEPARATOR_RE = re.compile(r'[\s,]*')
+# 下一个不在字符串内的括号（字符串整体跳过）；字符串不完整时匹配失败
+_BRACKET_RE = re.compile(rb'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*([{}\[\]])')
+# json.dump(indent=N) 格式：数组后换行缩进，第一个元素是对象
+_INDENTED_ARRAY_RE = re.compile(rb'\[(\n[ \t]+)\{')
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _open_text(path, mode):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _open_binary(path):
+    path = Path(path)
+    return gzip.open(path, 'rb') if path.suffix == '.gz' else open(path, 'rb')
+
+
+def is_jsonl(path):
+    """按后缀判断是否为 JSONL（.jsonl / .jsonl.gz）"""
+    suffixes = Path(path).suffixes
+    return bool(suffixes) and (suffixes[-1] == '.jsonl' or suffixes[-2:] == ['.jsonl', '.gz'])
+
+
+def _format_array_item(record):
+    """把一条记录格式化为 json.dump(indent=2) 输出中的一个数组元素
+
+    清洗结果都是只含标量值的字典，逐个字段用 C 实现的编码器编码，
+    比对每条记录调用 json.dumps(indent=2)（纯 Python 编码器）快得多；其他结构走通用路径。
+    """
+    if isinstance(record, dict) and record and all(
+            type(key) is str and isinstance(value, _SCALAR_TYPES) for key, value in record.items()):
+        encode = _ENCODER.encode
+        return '  {\n    ' + ',\n    '.join(
+            f"{encode_basestring(key)}: {encode_basestring(value) if type(value) is str else encode(value)}"
+            for key, value in record.items()) + '\n  }'
+    # JSON 字符串中的换行都已转义，输出中的换行只会出现在结构之间
+    return '  ' + json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+
+
+def _iter_json_array(f, chunk_size):
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("文件不是 JSON 数组")
+    pos, eof = 1, False
+    while True:
+        pos = _SEPARATOR_RE.match(buffer, pos).end()
+        if pos < len(buffer):
+            if buffer[pos] == ']':
+                return
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+                yield record
+                continue
+            except json.JSONDecodeError:
+                # 记录被块边界截断，读入下一块后重新解析
+                if eof:
+                    raise
+        elif eof:
+            raise ValueError("JSON 数组不完整")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _iter_json_array_slices(f, chunk_size, block_size=1 << 22):
+    """把以二进制打开的 JSON 数组切成字节片段，每段约 chunk_size 个完整的顶层元素，只定位边界、不解码不解析
+
+    json.dump(indent=N) 格式（save_to_json、write_json_array 的输出）中顶层对象以
+    「换行 + N 格缩进 + }」结束，JSON 字符串里不会有未转义的换行，直接查找这个标记；
+    其他格式按括号深度扫描，字符串整体跳过。UTF-8 多字节字符中不会出现这些 ASCII 字节。
+    只按对象和数组计数，标量元素和单行的空对象会并入相邻片段。
+    片段之间的逗号、末尾的 ] 留给 _decode_json_array_slice 跳过。
+    """
+    buffer = b''
+    while not buffer:
+        chunk = f.read(block_size)
+        if not chunk:
+            break
+        buffer = chunk.lstrip()
+    if not buffer.startswith(b'['):
+        raise ValueError("文件不是 JSON 数组")
+    indented = _INDENTED_ARRAY_RE.match(buffer)
+    marker = indented.group(1) + b'}' if indented else None
+    parts = []  # 已扫描、尚未给出的文本；读入新块时只复制未扫描的尾部
+    start = pos = 1  # start: 当前片段在 buffer 中的起点；pos: 已经扫描到的位置
+    depth = count = 0
+    closed = eof = False
+    while True:
+        while count < chunk_size and not closed:
+            if marker is not None:
+                end = buffer.find(marker, pos)
+                if end < 0:
+                    break
+                pos = end + len(marker)
+                count += 1
+                continue
+            match = _BRACKET_RE.match(buffer, pos)
+            if match is None:
+                break
+            pos = match.end()
+            if match.group(1) in b'{[':
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 0:
+                count += 1
+            closed = depth < 0
+        if count == chunk_size:
+            parts.append(buffer[start:pos])
+            yield b''.join(parts)
+            parts, start, count = [], pos, 0
+            continue
+        if closed or eof:
+            # 剩余部分（可能只有 ]）；文件不完整时由解析一方报错
+            parts.append(buffer[start:])
+            rest = b''.join(parts)
+            if rest.strip(b' \t\r\n,]'):
+                yield rest
+            return
+        parts.append(buffer[start:pos])
+        chunk = f.read(block_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        start = pos = 0
+
+
+def _decode_json_array_slice(data):
+    text = data.decode('utf-8')
+    decoder = json.JSONDecoder()
+    records, pos = [], 0
+    while True:
+        pos = _SEPARATOR_RE.match(text, pos).end()
+        if pos == len(text) or text[pos] == ']':
+            return records
+        record, pos = decoder.raw_decode(text, pos)
+        records.append(record)
+
+
+def iter_record_chunks(path, chunk_size):
+    """按块读取输入、不做解析，每块约 chunk_size 条，供多进程清洗使用
+
+    JSONL 给出未解析的行的列表，JSON 数组给出一段未解码的字节（见 _iter_json_array_slices），
+    解析留给子进程用 load_chunk 并行完成，主进程只负责切分。
+    """
+    if is_jsonl(path):
+        with _open_text(path, 'r') as f:
+            lines = (line for line in f if line.strip())
+            yield from iter(lambda: list(islice(lines, chunk_size)), [])
+    else:
+        with _open_binary(path) as f:
+            yield from _iter_json_array_slices(f, chunk_size)
+
+
+def load_chunk(chunk):
+    """把 iter_record_chunks 给出的一块还原成记录列表"""
+    if isinstance(chunk, bytes):
+        return _decode_json_array_slice(chunk)
+    return [json.loads(line) for line in chunk]
+
+
+def format_record(record, jsonl):
+    """按输出格式把一条记录格式化为文本，交给 RecordWriter.write_formatted 写出"""
+    return json.dumps(record, ensure_ascii=False) if jsonl else _format_array_item(record)
+
+
+def iter_records(path, chunk_size=1 << 20):
+    """逐条读取记录，内存中只保留当前记录和一个读取块
+
+    .jsonl/.jsonl.gz 按行读取；其他文件按 JSON 数组增量解析（json.dump 输出的格式），
+    不会一次性 json.load 整个文件。
+    """
+    with _open_text(path, 'r') as f:
+        if is_jsonl(path):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f, chunk_size)
+
+
+class RecordWriter:
+    """逐条写出记录：.jsonl 每行一条；其他后缀写成 JSON 数组，格式与 json.dump(indent=2) 相同"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.jsonl = is_jsonl(self.path)
+        self.count = 0
+        self._file = _open_text(self.path, 'w')
+        if not self.jsonl:
+            self._file.write('[')
+
+    def write(self, record):
+        self.write_formatted((format_record(record, self.jsonl),))
+
+    def write_formatted(self, items):
+        """写出已经用 format_record 格式化好的记录（格式化可以在子进程中完成）"""
+        for item in items:
+            if self.jsonl:
+                self._file.write(item + '\n')
+            else:
+                self._file.write((',\n' if self.count else '\n') + item)
+            self.count += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        if not self.jsonl:
+            self._file.write('\n]' if self.count else ']')
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
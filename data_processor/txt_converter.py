@@ -4,17 +4,170 @@ import os
 from datetime import datetime
 from pathlib import Path
 
+from .record_io import _open_text, iter_records
+
+# 与 MAXKB_CONFIG['upload']['max_file_size'] 一致，单个文档超过该大小会被服务端拒绝
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024
+
+
+class _ShardWriter:
+    """把格式化好的记录块流式写入分片文件，每个分片（含头尾）不超过 max_file_size 字节
+
+    记录块先写入临时正文文件，分片写满时再补上包含本分片记录数的头部和总结，
+    因此内存中只保留当前记录块。一条记录不会被拆到两个分片中。
+    """
+
+    def __init__(self, output_dir, base_name, source_name, max_file_size):
+        self.output_dir = Path(output_dir)
+        self.base_name = base_name
+        self.source_name = source_name
+        self.max_file_size = max_file_size
+        self.shards = []
+        self.total = 0
+        self.oversized = 0
+        self._body_path = self.output_dir / f"{base_name}.body.tmp"
+        self._body = None
+        self._count = 0
+        self._size = 0
+        # 头部和总结按最大可能的记录数预留空间
+        self._overhead = len(self._header(10 ** 12).encode('utf-8')) + len(self._footer(10 ** 12).encode('utf-8'))
+
+    def _header(self, count):
+        return (f"# 贴吧数据分析文档 - {self.source_name}\n"
+                f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"数据条数: {count}\n"
+                + "=" * 60 + "\n")
+
+    @staticmethod
+    def _footer(count):
+        return f"\n## 数据总结\n共收集 {count} 条贴吧数据\n"
+
+    def add(self, block):
+        data = block.encode('utf-8')
+        if self._count and self._size + len(data) + self._overhead > self.max_file_size:
+            self._finish_shard()
+        if len(data) + self._overhead > self.max_file_size:
+            # 单条记录本身超出预算时单独成片
+            self.oversized += 1
+        if self._body is None:
+            self._body = open(self._body_path, 'wb')
+        self._body.write(data)
+        self._count += 1
+        self._size += len(data)
+        self.total += 1
+
+    def _finish_shard(self):
+        self._body.close()
+        self._body = None
+        shard_path = self.output_dir / f"{self.base_name}_part{len(self.shards) + 1:03d}.txt"
+        with open(shard_path, 'wb') as out, open(self._body_path, 'rb') as body:
+            out.write(self._header(self._count).encode('utf-8'))
+            while True:
+                chunk = body.read(1 << 20)
+                if not chunk:
+                    break
+                out.write(chunk)
+            out.write(self._footer(self._count).encode('utf-8'))
+        self._body_path.unlink()
+        self.shards.append(shard_path)
+        self._count = self._size = 0
+
+    def close(self):
+        """写完最后一个分片，返回分片路径列表；只有一个分片时不带 _partNNN 后缀"""
+        if self._count:
+            self._finish_shard()
+        if len(self.shards) == 1:
+            single_path = self.output_dir / f"{self.base_name}.txt"
+            self.shards[0].replace(single_path)
+            self.shards = [single_path]
+        return [str(path) for path in self.shards]
+
+    def abort(self):
+        """出错时删除临时文件和已写出的分片"""
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+        for path in self.shards + [self._body_path]:
+            if path.exists():
+                path.unlink()
+        self.shards = []
+
+
 class TXTConverter:
-    
-    
-    def __init__(self, output_dir="./data/maxkb_docs"):
+
+
+    def __init__(self, output_dir="./data/maxkb_docs", max_file_size=DEFAULT_MAX_FILE_SIZE):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-    
+        self.max_file_size = max_file_size
+
     def convert_for_maxkb(self, json_path, source_name="tieba_data"):
-    
+        """转换为 MaxKB 文档，返回生成的文件路径列表
+
+        记录列表（JSON 数组或 JSONL）逐条读取、逐条写出，超过 max_file_size 时切换到新的分片；
+        单个字典按原样生成一个摘要文件。
+        """
+
         print(f"[INFO] 转换JSON文件: {json_path}")
-        
+
+        # 生成文件名
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base_name = f"maxkb_{source_name}_{timestamp}"
+
+        if self._is_json_object(json_path):
+            output_paths = [self._convert_dict_file(json_path, source_name, base_name)]
+        else:
+            writer = _ShardWriter(self.output_dir, base_name, source_name, self.max_file_size)
+            try:
+                for idx, item in enumerate(iter_records(json_path), 1):
+                    writer.add(self._format_item(idx, item))
+                output_paths = writer.close()
+            except Exception as e:
+                writer.abort()
+                print(f"[❌] 读取JSON失败: {e}")
+                raise
+            if not writer.total:
+                output_path = self.output_dir / f"{base_name}.txt"
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write("# 空数据列表\n")
+                output_paths = [str(output_path)]
+            if writer.oversized:
+                print(f"[INFO] {writer.oversized} 条记录单独超过 {self.max_file_size} 字节，已各自单独成文件")
+
+        for output_path in output_paths:
+            print(f"[✅] TXT文件已生成: {output_path}")
+            print(f"     文件大小: {os.path.getsize(output_path)} 字节")
+
+        return output_paths
+
+    @staticmethod
+    def _is_json_object(json_path):
+        """按第一个非空白字符判断文件是否为单个 JSON 对象（JSONL 每行也以 { 开头，需排除）"""
+        if Path(json_path).suffix in ('.jsonl', '.gz'):
+            return False
+        with _open_text(json_path, 'r') as f:
+            while True:
+                ch = f.read(1)
+                if not ch or not ch.isspace():
+                    return ch == '{'
+
+    @staticmethod
+    def _format_item(idx, item):
+        """格式化一条记录"""
+        lines = [f"\n## 记录 {idx}\n", "-" * 40 + "\n"]
+        if isinstance(item, dict):
+            for key, value in item.items():
+                value_str = str(value)
+                # 清理和格式化值
+                if len(value_str) > 300:
+                    value_str = value_str[:297] + "..."
+                lines.append(f"{key}: {value_str}\n")
+        else:
+            lines.append(f"数据: {str(item)}\n")
+        lines.append("-" * 40 + "\n")
+        return ''.join(lines)
+
+    def _convert_dict_file(self, json_path, source_name, base_name):
         try:
             # 读取JSON数据
             with open(json_path, 'r', encoding='utf-8') as f:
@@ -22,62 +175,12 @@ class TXTConverter:
         except Exception as e:
             print(f"[❌] 读取JSON失败: {e}")
             raise
-        
-        # 生成TXT内容
-        if isinstance(data, list):
-            content = self._convert_list(data, source_name)
-        elif isinstance(data, dict):
-            content = self._convert_dict(data, source_name)
-        else:
-            raise TypeError(f"不支持的数据类型: {type(data)}")
-        
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"maxkb_{source_name}_{timestamp}.txt"
-        output_path = self.output_dir / filename
-        
-        # 保存文件
+
+        output_path = self.output_dir / f"{base_name}.txt"
         with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print(f"[✅] TXT文件已生成: {output_path}")
-        print(f"     文件大小: {os.path.getsize(output_path)} 字节")
-        
+            f.write(self._convert_dict(data, source_name))
         return str(output_path)
     
-    def _convert_list(self, data_list, source_name):
-        """转换列表数据"""
-        if not data_list:
-            return "# 空数据列表\n"
-        
-        lines = []
-        lines.append(f"# 贴吧数据分析文档 - {source_name}\n")
-        lines.append(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        lines.append(f"数据条数: {len(data_list)}\n")
-        lines.append("=" * 60 + "\n")
-        
-        for idx, item in enumerate(data_list, 1):
-            lines.append(f"\n## 记录 {idx}\n")
-            lines.append("-" * 40 + "\n")
-            
-            if isinstance(item, dict):
-                for key, value in item.items():
-                    value_str = str(value)
-                    # 清理和格式化值
-                    if len(value_str) > 300:
-                        value_str = value_str[:297] + "..."
-                    lines.append(f"{key}: {value_str}\n")
-            else:
-                lines.append(f"数据: {str(item)}\n")
-            
-            lines.append("-" * 40 + "\n")
-        
-        # 添加总结
-        lines.append(f"\n## 数据总结\n")
-        lines.append(f"共收集 {len(data_list)} 条贴吧数据\n")
-        
-        return ''.join(lines)
-    
     def _convert_dict(self, data_dict, source_name):
         """转换字典数据"""
         lines = []
@@ -100,16 +203,20 @@ class TXTConverter:
         return ''.join(lines)
 
 # 便捷函数，用于兼容旧代码
-def convert_cleaned_json_to_txt(cleaned_json_path, output_txt_dir="./data/maxkb_docs"):
+def convert_cleaned_json_to_txt(cleaned_json_path, output_txt_dir="./data/maxkb_docs", source_name=None,
+                                max_file_size=DEFAULT_MAX_FILE_SIZE):
     """
-    将清洗后的JSON文件转换为TXT文件的便捷函数
+    将清洗后的JSON文件转换为TXT文件的便捷函数，返回分片文件路径列表
     注意：这是一个包装函数，实际使用 TXTConverter 类
     """
-    converter = TXTConverter(output_dir=output_txt_dir)
+    converter = TXTConverter(output_dir=output_txt_dir, max_file_size=max_file_size)
+    if source_name is not None:
+        return converter.convert_for_maxkb(cleaned_json_path, source_name)
     # 从文件名提取贴吧名称
     base_name = os.path.basename(cleaned_json_path)
-    if 'cleaned_' in base_name:
-        name_part = base_name.replace('cleaned_', '').replace('.json', '')
+    prefix = next((p for p in ('cleaned_', 'deduped_') if p in base_name), None)
+    if prefix:
+        name_part = base_name.replace(prefix, '').replace('.jsonl', '').replace('.json', '')
         tieba_name = name_part.split('_')[0] if '_' in name_part else name_part
     else:
         tieba_name = "贴吧数据"
@@ -1,8 +1,10 @@
 
 import sys
 import os
+import json
 import time
 import asyncio
+import importlib.util
 import requests
 from pathlib import Path
 
@@ -10,23 +12,70 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from spider.tieba_spider import TiebaSpider
-from data_processor.cleaner import clean_tieba_data
+from spider.checkpoint import CrawlCheckpoint
+from data_processor.cleaner import stream_clean_tieba_data
+from data_processor.columnar import CorpusStore
+from data_processor.dedup import SimHashIndex, dedup_tieba_data
+from data_processor.manifest import CleaningManifest
+from data_processor.record_io import iter_records
 from data_processor.txt_converter import convert_cleaned_json_to_txt
 from maxkb_manager.deploy import MaxKBDeployer
 from maxkb_manager.api_client import MaxKBClient
 from maxkb_manager.jwt_client_fixed import MaxKBFixedClient
-from config import MAXKB_CONFIG
+from config import (MAXKB_CONFIG, THREAD_INDEX_PATH, RAW_DATA_DIR, DEDUP_INDEX_PATH, CORPUS_STORE_DIR,
+                    CLEANING_MANIFEST_PATH, PENDING_UPLOADS_PATH)
 
-def run_spider_wrapper(tieba_name, max_pages):
+def checkpoint_path_for(tieba_name):
+    """每个贴吧固定一个断点文件，中断后可以从这里继续"""
+    return RAW_DATA_DIR / f"{tieba_name}_checkpoint.json"
+
+def run_spider_wrapper(tieba_name, max_pages, resume=False):
     """包装异步爬虫，使其可在同步代码中调用"""
     async def _run():
-        spider = TiebaSpider(tieba_name)
-        await spider.crawl_tieba(max_pages=max_pages)
-        json_path = spider.save_to_json(f"{tieba_name}_raw_{int(time.time())}.json")
-        await spider.close()
-        return json_path
+        run_id = int(time.time())
+        # 爬取过程中逐条写入 JSONL 并定期保存断点，结束后再导出为 JSON
+        spider = TiebaSpider(tieba_name, index_path=THREAD_INDEX_PATH,
+                             sink_path=RAW_DATA_DIR / f"{tieba_name}_raw_{run_id}.jsonl",
+                             checkpoint_path=checkpoint_path_for(tieba_name), resume=resume)
+        try:
+            await spider.crawl_tieba(max_pages=max_pages)
+            spider.display_metrics()
+            spider.save_metrics(RAW_DATA_DIR / f"{tieba_name}_metrics_{run_id}.json",
+                                RAW_DATA_DIR / f"{tieba_name}.prom")
+            return spider.save_to_json(f"{tieba_name}_raw_{run_id}.json")
+        finally:
+            await spider.close()
     return asyncio.run(_run())
 
+def finish_batch(batch_id, uploaded, forum=None, cleaned_path=None):
+    """上传成功后确认本批次的清洗清单登记和去重指纹；否则丢弃，这些帖子下次运行仍会被处理和上传
+
+    确认时先把本批次的清洗结果（cleaned_path）追加到列式存储（安装了 pyarrow 时），
+    列式存储只追加确认过的批次，丢弃的批次下次重新清洗时不会被重复写入。
+    """
+    if batch_id is None:
+        return
+    if uploaded and cleaned_path is not None and importlib.util.find_spec('pyarrow'):
+        CorpusStore(CORPUS_STORE_DIR).append(iter_records(cleaned_path), forum)
+    with CleaningManifest(CLEANING_MANIFEST_PATH) as manifest, SimHashIndex(DEDUP_INDEX_PATH) as index:
+        if uploaded:
+            manifest.confirm(batch_id)
+            index.confirm(batch_id)
+        else:
+            manifest.discard(batch_id)
+            index.discard(batch_id)
+
+def load_pending_uploads():
+    """上次部分上传失败、等待重新上传的文档（已被删除的文件跳过）"""
+    if not PENDING_UPLOADS_PATH.exists():
+        return []
+    with open(PENDING_UPLOADS_PATH, 'r', encoding='utf-8') as f:
+        return [path for path in json.load(f) if os.path.exists(path)]
+
+def save_pending_uploads(paths):
+    with open(PENDING_UPLOADS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(paths, f, ensure_ascii=False, indent=2)
+
 # 在 main.py 中修复重复日志
 def check_maxkb_health(base_url, timeout=60):
     """检查MaxKB服务是否完全就绪"""
@@ -79,31 +128,58 @@ def main():
 
     # --- 2. 执行爬虫与清洗 ---
     enable_crawl = input(">>> 是否爬取新数据？(y/n, 默认y): ").strip().lower()
+    # 本次处理的批次：清洗清单登记和去重指纹在上传成功后才确认入库，清洗结果同时追加到列式存储
+    batch_id = batch_cleaned_path = None
     if enable_crawl in ['y', 'yes', '']:
+        resume = False
+        checkpoint = CrawlCheckpoint.load(checkpoint_path_for(tieba_name))
+        if checkpoint is not None and not checkpoint.finished:
+            print(f"[💾] 检测到未完成的爬取：已完成 {len(checkpoint.completed_pages)}/{len(checkpoint.planned_pages)} 页，"
+                  f"{checkpoint.total_posts} 个帖子")
+            resume = input(">>> 是否从断点继续？(y/n, 默认y): ").strip().lower() in ['y', 'yes', '']
         try:
             print("\n[1/5] 爬取贴吧数据...")
-            raw_data_path = run_spider_wrapper(tieba_name, max_pages)
+            raw_data_path = run_spider_wrapper(tieba_name, max_pages, resume=resume)
             print(f"    ✅ 原始数据: {os.path.basename(raw_data_path)}")
 
             print("\n[2/5] 清洗数据...")
             cleaned_dir = Path(__file__).parent / "data" / "cleaned"
             cleaned_dir.mkdir(parents=True, exist_ok=True)
+            batch_id = f"{tieba_name}_{int(time.time())}"
             cleaned_data_path = cleaned_dir / f"cleaned_{tieba_name}_{int(time.time())}.json"
-            clean_tieba_data(raw_data_path, str(cleaned_data_path))
+            # 清单中已处理且内容没有变化的帖子直接跳过，只有新帖和有变化的帖子进入后续步骤
+            stream_clean_tieba_data(raw_data_path, str(cleaned_data_path), manifest_path=CLEANING_MANIFEST_PATH,
+                                    batch_id=batch_id)
             print(f"    ✅ 清洗完成: {cleaned_data_path.name}")
+            # 安装了 pyarrow 时，批次确认后清洗结果追加到按贴吧和日期分区的列式存储，便于跨批次分析
+            batch_cleaned_path = str(cleaned_data_path)
 
-            print("\n[2.5/5] 转换为MaxKB格式文档...")
-            txt_for_maxkb_path = convert_cleaned_json_to_txt(str(cleaned_data_path))
-            print(f"    ✅ 转换完成: {os.path.basename(txt_for_maxkb_path)}")
-            document_to_upload_path = txt_for_maxkb_path
+            print("\n[2.2/5] 近似去重...")
+            deduped_data_path = cleaned_dir / f"deduped_{tieba_name}_{int(time.time())}.json"
+            dedup_tieba_data(str(cleaned_data_path), str(deduped_data_path), DEDUP_INDEX_PATH, batch_id=batch_id)
+            cleaned_data_path = deduped_data_path
+
+            if next(iter_records(cleaned_data_path), None) is None:
+                print("    没有新的帖子需要转换和上传")
+                document_paths = []
+                finish_batch(batch_id, uploaded=True, forum=tieba_name, cleaned_path=batch_cleaned_path)
+            else:
+                print("\n[2.5/5] 转换为MaxKB格式文档...")
+                # 按上传大小上限切分为多个文档，每个文档都能被服务端接受
+                document_paths = convert_cleaned_json_to_txt(
+                    str(cleaned_data_path), source_name=tieba_name,
+                    max_file_size=MAXKB_CONFIG['upload']['max_file_size']
+                )
+                print(f"    ✅ 转换完成: {len(document_paths)} 个文档")
 
         except Exception as e:
             print(f"[❌] 数据准备阶段失败: {e}")
             print("将使用已有数据进行聊天...")
-            document_to_upload_path = None
+            document_paths = []
+            finish_batch(batch_id, uploaded=False)
     else:
         print("跳过数据爬取，直接进入聊天分析...")
-        document_to_upload_path = None
+        document_paths = []
 
     # --- 3. 启动MaxKB服务 ---
     print("\n[3/5] 启动MaxKB分析引擎...")
@@ -113,15 +189,20 @@ def main():
 
         if not check_maxkb_health(MAXKB_CONFIG['base_url']):
             print("[❌] MaxKB服务健康检查失败，请检查日志。")
+            if document_paths:
+                finish_batch(batch_id, uploaded=False)
             return
 
     except Exception as e:
         print(f"[❌] 启动MaxKB服务时出错: {e}")
         print("请确保Docker Desktop正在运行，且端口8080未被占用。")
+        if document_paths:
+            finish_batch(batch_id, uploaded=False)
         return
 
     # --- 4. 上传数据到知识库---
-    if document_to_upload_path:
+    pending_uploads = load_pending_uploads()
+    if document_paths or pending_uploads:
         print("\n[4/5] 上传数据到知识库...")
         try:
             # 使用原始客户端上传文档（需要管理员权限）
@@ -147,17 +228,41 @@ def main():
                 print(f"    ⚠️  未找到知识库 {kb_id}，但将继续尝试上传")
 
             # 上传文档
-            print(f"    📤 正在上传数据文件...")
-            upload_success = admin_client.upload_document(kb_id, document_to_upload_path)
+            print(f"    📤 正在上传 {len(document_paths)} 个数据文件...")
+            if pending_uploads:
+                print(f"    📤 另有 {len(pending_uploads)} 个上次未上传成功的文件，一并重新上传")
+            # 先走本地分段直接导入；服务端不接受时退回到 /document/split 的上传方式
+            chunk_size = MAXKB_CONFIG['upload']['chunk_size']
+            failed = []
+            for path in pending_uploads + document_paths:
+                try:
+                    uploaded = (admin_client.upload_document_direct(kb_id, path, chunk_size=chunk_size)
+                                or admin_client.upload_document(kb_id, path))
+                except Exception as e:
+                    print(f"    ❌ 上传 {os.path.basename(path)} 时出错: {e}")
+                    uploaded = False
+                if not uploaded:
+                    failed.append(path)
 
-            if upload_success:
+            # 本批次只要有文件已经入库就确认整批：丢弃后重新生成会让已入库的文件再上传一次。
+            # 未上传成功的文件记入待重传列表，下次运行时重新上传；整批都失败时丢弃，下次重新处理
+            batch_failed = [path for path in document_paths if path in failed]
+            if document_paths:
+                batch_confirmed = len(batch_failed) < len(document_paths)
+                finish_batch(batch_id, uploaded=batch_confirmed, forum=tieba_name, cleaned_path=batch_cleaned_path)
+                if not batch_confirmed:
+                    batch_failed = []
+            save_pending_uploads([path for path in pending_uploads if path in failed] + batch_failed)
+            if not failed:
                 print("    ✅ 数据上传并处理成功！")
             else:
-                print("    ❌ 数据上传失败，但聊天功能仍可尝试使用旧数据。")
+                print(f"    ❌ {len(failed)} 个文件上传失败，但聊天功能仍可尝试使用旧数据。")
 
         except Exception as e:
             print(f"[❌] 上传数据时出错: {e}")
             print("将尝试继续启动聊天功能...")
+            if document_paths:
+                finish_batch(batch_id, uploaded=False)
     else:
         print("\n[4/5] 跳过数据上传，使用已有知识库...")
 
@@ -2,9 +2,66 @@
 import requests
 import json
 import os
+import re
 import time
 from typing import Optional, Dict, Any, List
 
+# 转换器为每条记录生成一个二级标题，本地分段以此为记录边界
+_SECTION_RE = re.compile(r'\n(?=## )')
+# 分隔线（---- / ====）只用于排版，不进入段落内容
+_RULE_LINE_RE = re.compile(r'^[-=]{3,}$')
+# 转换器在每个分片末尾写的统计小节（见 txt_converter），不是帖子内容
+_SUMMARY_TITLE = '数据总结'
+# MaxKB 段落标题的长度上限
+_MAX_TITLE_LENGTH = 255
+
+
+def _chunk_lines(lines, chunk_size):
+    """把若干行按顺序拼成不超过 chunk_size 个字符的块，单行过长时硬切"""
+    chunks, current = [], ''
+    for line in lines:
+        while len(line) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:chunk_size])
+            line = line[chunk_size:]
+        if current and len(current) + 1 + len(line) > chunk_size:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def segment_document(text, chunk_size=1000):
+    """在本地把文档切成段落：每个二级标题（一条记录）一段，超过 chunk_size 的段按行再切开
+
+    返回 batch_create 接口使用的段落列表，标题为小节标题。第一个二级标题之前的文档头
+    （文档标题、生成时间、数据条数）和末尾的"数据总结"小节不生成段落；没有二级标题的文档整篇切分。
+    """
+    sections = [section.strip() for section in _SECTION_RE.split(text)]
+    has_headings = any(section.startswith('## ') for section in sections)
+    paragraphs = []
+    for section in sections:
+        if not section:
+            continue
+        title, body = '', section
+        if section.startswith('## '):
+            title, _, body = section.partition('\n')
+            title = title[3:].strip()[:_MAX_TITLE_LENGTH]
+            if title == _SUMMARY_TITLE:
+                continue
+        elif has_headings:
+            continue
+        lines = [line for line in (line.strip() for line in body.splitlines())
+                 if line and not _RULE_LINE_RE.match(line)]
+        for content in _chunk_lines(lines, chunk_size):
+            paragraphs.append({'title': title, 'content': content, 'similarity': 0.8})
+    return paragraphs
+
+
 class MaxKBClient:
     
     
@@ -328,6 +385,54 @@ class MaxKBClient:
     
     # ==================== 文档上传 ====================
     
+    def _batch_create(self, kb_id, documents):
+        """调用 batch_create 接口创建文档及其段落，返回是否成功"""
+        batch_create_url = f"{self.workspace_api_base}/knowledge/{kb_id}/document/batch_create"
+        try:
+            # 中文按 UTF-8 原样发送，requests 的 json= 会转成 \uXXXX 转义，体积翻倍
+            body = json.dumps(documents, ensure_ascii=False).encode('utf-8')
+            batch_response = self.session.put(
+                batch_create_url, data=body, timeout=60,
+                headers={'Content-Type': 'application/json; charset=utf-8'}
+            )
+            
+            if batch_response.status_code in [200, 201]:
+                batch_result = batch_response.json()
+                if batch_result.get('code') in [200, 201]:
+                    print("[✅] 知识库文档批量创建成功！知识库内容已更新。")
+                    return True
+                else:
+                    print(f"[⚠️] 段落导入时服务器返回业务错误: {batch_result.get('message')}")
+            else:
+                print(f"[⚠️] 段落导入请求失败 (HTTP {batch_response.status_code}): {batch_response.text[:200]}")
+        
+        except Exception as e:
+            print(f"[⚠️] 调用 batch_create 接口时发生异常: {e}")
+        return False
+
+    def upload_document_direct(self, kb_id, file_path, chunk_size=1000):
+        """本地分段后直接调用 batch_create 导入文档，不经过服务端的 /document/split
+
+        文本只上传一次，服务端也不必再做一次分段；段落按记录切分，每段不超过 chunk_size 个字符。
+        """
+        if not os.path.exists(file_path):
+            print(f"[❌] 文件不存在: {file_path}")
+            return False
+
+        filename = os.path.basename(file_path)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            paragraphs = segment_document(f.read(), chunk_size)
+        if not paragraphs:
+            print(f"[⚠️] 文档 {filename} 没有可导入的内容段落")
+            return False
+
+        print(f"[📤] 正在导入文档: {filename} -> 知识库 {kb_id}（本地分段 {len(paragraphs)} 个段落）")
+        return self._batch_create(kb_id, [{
+            'name': filename,
+            'title': filename,
+            'paragraphs': paragraphs,
+        }])
+
     # 在 api_client.py 的 upload_document 方法中
 
     def upload_document(self, kb_id, file_path):
@@ -403,24 +508,8 @@ class MaxKBClient:
                             })
                         
                         # 批量创建段落
-                        batch_create_url = f"{self.workspace_api_base}/knowledge/{kb_id}/document/batch_create"
                         print(f"[🔄] 正在将解析出的 {total_paragraphs} 个段落导入知识库...")
-                        
-                        try:
-                            batch_response = self.session.put(batch_create_url, json=documents_to_create, timeout=60)
-                            
-                            if batch_response.status_code in [200, 201]:
-                                batch_result = batch_response.json()
-                                if batch_result.get('code') in [200, 201]:
-                                    print(f"[✅] 知识库文档批量创建成功！知识库内容已更新。")
-                                    return True
-                                else:
-                                    print(f"[⚠️] 段落导入时服务器返回业务错误: {batch_result.get('message')}")
-                            else:
-                                print(f"[⚠️] 段落导入请求失败 (HTTP {batch_response.status_code}): {batch_response.text[:200]}")
-                        
-                        except Exception as e:
-                            print(f"[⚠️] 调用 batch_create 接口时发生异常: {e}")
+                        return self._batch_create(kb_id, documents_to_create)
                     else:
                         print(f"[⚠️] 文档解析后未获得有效内容段落")
                     
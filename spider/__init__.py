@@ -1,5 +1,5 @@
 
-from .tieba_spider import TiebaSpider
+from .tieba_spider import TiebaSpider, crawl_many
 
 
-__all__ = ['TiebaSpider']
\ No newline at end of file
+__all__ = ['TiebaSpider', 'crawl_many']
\ No newline at end of file
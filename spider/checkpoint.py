@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from .sink import iter_jsonl
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlCheckpoint:
+    """爬取断点：记录计划抓取的页、已完成的页和已写出的帖子
+
+    状态变化后最多每 interval 秒写一次盘（先写临时文件再替换，避免写到一半被打断），
+    爬取结束或被中断时由 TiebaSpider 再强制保存一次。帖子本身由 JSONL sink 保存，
+    断点中只记录 post_url，恢复时跳过已完成的页和帖子。
+    """
+
+    def __init__(self, path, tieba_name, sink_path=None, interval=30):
+        self.path = Path(path)
+        self.tieba_name = tieba_name
+        self.sink_path = str(sink_path) if sink_path else None
+        self.interval = interval
+        self.planned_pages = []
+        self.completed_pages = set()
+        self.completed_threads = set()
+        self.total_posts = 0
+        self.finished = False
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, path, interval=30):
+        """读取断点文件，不存在或已损坏时返回 None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取断点失败，将重新开始: {e}")
+            return None
+        checkpoint = cls(path, state['tieba_name'], state.get('sink_path'), interval=interval)
+        checkpoint.planned_pages = state.get('planned_pages', [])
+        checkpoint.completed_pages = set(state.get('completed_pages', []))
+        checkpoint.completed_threads = set(state.get('completed_threads', []))
+        checkpoint.total_posts = state.get('total_posts', 0)
+        checkpoint.finished = state.get('finished', False)
+        return checkpoint
+
+    @property
+    def started(self):
+        return bool(self.planned_pages)
+
+    def plan(self, pages):
+        self.planned_pages = list(pages)
+        self.save()
+
+    def pending_pages(self):
+        return [page for page in self.planned_pages if page not in self.completed_pages]
+
+    def thread_done(self, post_url):
+        return post_url in self.completed_threads
+
+    def mark_thread(self, post_url):
+        if post_url:
+            self.completed_threads.add(post_url)
+        self.total_posts += 1
+        self._maybe_save()
+
+    def mark_page(self, page_num):
+        self.completed_pages.add(page_num)
+        self._maybe_save()
+
+    def recover_from_sink(self):
+        """按 sink 文件重建已完成的帖子和帖子总数
+
+        sink 每条帖子都立即刷盘，断点却最多每 interval 秒保存一次，进程被强制结束
+        （OOM、渲染卡死被杀）后 sink 比断点新，以 sink 为准才不会重复抓取和写出。
+        未压缩文件最后一行可能只写了一半，先截掉再继续追加。
+        """
+        if not self.sink_path or not Path(self.sink_path).exists():
+            return
+        path = Path(self.sink_path)
+        compress = path.suffix == '.gz'
+        if not compress:
+            _truncate_partial_line(path)
+        completed_threads, total_posts = set(), 0
+        try:
+            for record in iter_jsonl(path, compress):
+                total_posts += 1
+                if record.get('post_url'):
+                    completed_threads.add(record['post_url'])
+        except (EOFError, OSError, ValueError) as e:
+            # gzip 文件被打断时尾部不完整，读到的部分仍然有效
+            logger.warning(f"sink 文件末尾不完整，已读取 {total_posts} 条: {e}")
+        self.completed_threads = completed_threads
+        self.total_posts = total_posts
+
+    def finish(self):
+        self.finished = True
+        self.save()
+
+    def _maybe_save(self):
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        state = {
+            'tieba_name': self.tieba_name,
+            'sink_path': self.sink_path,
+            'planned_pages': self.planned_pages,
+            'completed_pages': sorted(self.completed_pages),
+            'completed_threads': sorted(self.completed_threads),
+            'total_posts': self.total_posts,
+            'finished': self.finished,
+            'updated_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+
+
+def _truncate_partial_line(path, block_size=4096):
+    """截掉文件末尾没有以换行结束的半行"""
+    with open(path, 'rb+') as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(block_size, pos)
+            f.seek(pos - step)
+            newline = f.read(step).rfind(b'\n')
+            if newline >= 0:
+                pos = pos - step + newline + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate(pos)
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from .sink import iter_jsonl, replies_path_for, write_json_array
+from .work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+
+async def worker_loop(tieba_name, queue_path, worker_id, result_path, job_concurrency=4,
+                      idle_sleep=1.0, retry_delay=5.0, **spider_kwargs):
+    """单个 worker 进程的主循环：从队列领取 probe/page/thread 任务，帖子写入自己的结果文件
+
+    probe 任务探测总页数并把各页入队；page 任务抓取列表页并把帖子入队；
+    thread 任务抓取帖子内容并写出记录。同一进程内 job_concurrency 个协程并行领取任务。
+    失败的任务立即交还队列，retry_delay 秒（每次失败翻倍）后可被重新领取。
+    """
+    from .tieba_spider import TiebaSpider
+
+    queue = WorkQueue(queue_path)
+    spider = TiebaSpider(tieba_name, sink_path=result_path, sink_append=True, **spider_kwargs)
+
+    async def handle(job):
+        if job.kind == 'probe':
+            total_pages = await spider.get_total_pages()
+            for page_num in range(1, min(total_pages, job.payload['max_pages']) + 1):
+                queue.put('page', {'page_num': page_num}, key=f"page:{page_num}")
+        elif job.kind == 'page':
+            for fields in await spider.fetch_page_threads(job.payload['page_num']):
+                key = f"thread:{fields['post_link']}" if fields['post_link'] else None
+                queue.put('thread', fields, key=key)
+        elif job.kind == 'thread':
+            post = await spider.build_post(job.payload)
+            if not post:
+                # 不 ack，交还队列稍后重试，超过最大尝试次数后放弃
+                raise RuntimeError(f"帖子抓取失败: {job.payload.get('post_link')}")
+            spider.emit(post)
+        else:
+            logger.warning(f"未知任务类型: {job.kind}")
+
+    async def run():
+        while True:
+            job = queue.lease(worker_id)
+            if job is None:
+                if queue.unfinished() == 0:
+                    return
+                await asyncio.sleep(idle_sleep)
+                continue
+            try:
+                await handle(job)
+            except Exception as e:
+                logger.warning(f"[{worker_id}] 任务 {job.kind}#{job.id} 失败（第 {job.attempts} 次）: {e}")
+                # 交还队列等待退避后重试，而不是占着租约直到过期；租约只在 worker 崩溃时兜底
+                queue.release(job.id, delay=retry_delay * 2 ** (job.attempts - 1))
+                continue
+            queue.ack(job.id)
+
+    try:
+        await asyncio.gather(*(run() for _ in range(job_concurrency)))
+    finally:
+        spider.save_metrics(Path(result_path).with_suffix('.metrics.json'))
+        await spider.close()
+        queue.close()
+    logger.info(f"[{worker_id}] 完成，写出 {spider.total_posts} 条记录")
+
+
+def _worker_main(tieba_name, queue_path, worker_id, result_path, spider_kwargs):
+    asyncio.run(worker_loop(tieba_name, queue_path, worker_id, result_path, **spider_kwargs))
+
+
+class CrawlCoordinator:
+    """多进程分片爬取：任务放在 work_dir 下的 SQLite 队列中，启动 N 个 worker 进程并行处理
+
+    每个 worker 运行自己的 TiebaSpider 和事件循环，结果写入 worker_<i>.jsonl，
+    全部完成后按 post_url 去重合并（队列是至少一次投递，同一帖子可能被处理两次）。
+    work_dir 中的队列是持久化的：resume=True 时接着处理上次中途退出时剩余的任务；
+    默认每次运行前清空上次的队列和结果文件，重新爬取。
+    """
+
+    def __init__(self, tieba_name, workers=None, max_pages=5, work_dir=None, resume=False, **spider_kwargs):
+        self.tieba_name = tieba_name
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pages = max_pages
+        self.work_dir = Path(work_dir or f"{tieba_name}_crawl")
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.queue_path = self.work_dir / "queue.db"
+        self.resume = resume
+        self.spider_kwargs = spider_kwargs
+
+    def result_paths(self):
+        return sorted(path for path in self.work_dir.glob("worker_*.jsonl")
+                      if not path.name.endswith('_replies.jsonl'))
+
+    def reply_paths(self):
+        """完整模式（full_thread=True）下各 worker 的回复结果文件"""
+        return sorted(self.work_dir.glob("worker_*_replies.jsonl"))
+
+    def reset(self):
+        """删除上次运行留下的队列（含 WAL 文件）和各 worker 的结果、指标文件"""
+        stale = [self.work_dir / f"{self.queue_path.name}{suffix}" for suffix in ('', '-wal', '-shm')]
+        stale += [path for path in self.work_dir.glob("worker_*") if path.is_file()]
+        for path in stale:
+            if path.exists():
+                path.unlink()
+
+    def run(self, output_path=None):
+        """执行爬取并合并结果，返回合并后的 JSON 文件路径（没有数据时返回 None）"""
+        if not self.resume:
+            self.reset()
+        queue = WorkQueue(self.queue_path)
+        queue.put('probe', {'max_pages': self.max_pages}, key='probe')
+        queue.close()
+
+        start_time = time.time()
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(
+                target=_worker_main,
+                args=(self.tieba_name, str(self.queue_path), f"worker_{i}",
+                      str(self.work_dir / f"worker_{i}.jsonl"), self.spider_kwargs),
+                name=f"tieba-worker-{i}",
+            )
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        queue = WorkQueue(self.queue_path)
+        logger.info(f"{self.workers} 个 worker 完成，耗时 {time.time() - start_time:.2f} 秒，任务状态: {queue.counts()}")
+        queue.close()
+        return self.merge(output_path)
+
+    def merge(self, output_path=None):
+        """按 post_url 去重合并各 worker 的结果文件"""
+        output_path = output_path or f"{self.tieba_name}_raw_{int(time.time())}.json"
+        seen = set()
+
+        def unique_posts():
+            for path in self.result_paths():
+                for post in iter_jsonl(path):
+                    key = post.get('post_url') or None
+                    if key is not None:
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    yield post
+
+        count = write_json_array(unique_posts(), output_path)
+        if not count:
+            logger.warning("没有数据可保存")
+            return None
+        logger.info(f"合并 {len(self.result_paths())} 个结果文件，共 {count} 个帖子: {output_path}")
+        if self.reply_paths():
+            self.merge_replies(replies_path_for(output_path))
+        return str(output_path)
+
+    def merge_replies(self, output_path):
+        """按 (post_url, floor) 去重合并各 worker 的回复文件"""
+        seen = set()
+
+        def unique_replies():
+            for path in self.reply_paths():
+                for reply in iter_jsonl(path):
+                    key = (reply.get('post_url'), reply.get('floor'))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield reply
+
+        count = write_json_array(unique_replies(), output_path)
+        logger.info(f"合并回复 {count} 条: {output_path}")
+        return str(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程分片爬取贴吧")
+    parser.add_argument('tieba_name')
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--work-dir', default=None)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--full-thread', action='store_true', help='抓取帖子的全部回复页')
+    parser.add_argument('--resume', action='store_true', help='接着处理 work_dir 中上次未完成的任务')
+    args = parser.parse_args()
+
+    coordinator = CrawlCoordinator(args.tieba_name, workers=args.workers, max_pages=args.pages,
+                                   work_dir=args.work_dir, resume=args.resume, full_thread=args.full_thread)
+    output = coordinator.run(args.output)
+    print(f"爬取完成：{output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 百度的人机验证页特征，出现即视为被反爬拦截
+ANTI_BOT_MARKERS = ('百度安全验证', 'wappass.baidu.com', '网络不给力，请稍后重试')
+
+
+class FetchError(Exception):
+    """一次抓取最终失败的结构化描述，记录到 errors 中而不是伪装成帖子内容"""
+
+    def __init__(self, url, kind, message='', status=None, attempts=0):
+        super().__init__(f"[{kind}] {url}: {message}")
+        self.url = url
+        self.kind = kind
+        self.message = message
+        self.status = status
+        self.attempts = attempts
+        self.time = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'kind': self.kind,
+            'message': self.message,
+            'status': self.status,
+            'attempts': self.attempts,
+            'time': self.time,
+        }
+
+
+class RetryableResponse(Exception):
+    """拿到了响应但内容不可用（5xx、限流、验证页），需要退避后重试"""
+
+    def __init__(self, kind, status=None):
+        super().__init__(kind)
+        self.kind = kind
+        self.status = status
+
+
+def check_response(response):
+    """检查原始 HTTP 响应，5xx/429/验证页抛出 RetryableResponse"""
+    status = getattr(response, 'status_code', 200)
+    if status == 429:
+        raise RetryableResponse('rate_limited', status)
+    if status >= 500:
+        raise RetryableResponse('http_5xx', status)
+    final_url = getattr(response, 'url', '') or ''
+    if 'wappass.baidu.com' in final_url or any(marker in response.text for marker in ANTI_BOT_MARKERS):
+        raise RetryableResponse('anti_bot', status)
+
+
+def check_html(html):
+    """检查渲染后的页面是否为验证页"""
+    if any(marker in (html.html or '') for marker in ANTI_BOT_MARKERS):
+        raise RetryableResponse('anti_bot')
+
+
+# requests 的异常类在出错时才导入：到那时 requests 早已被 requests_html 加载
+def _is_timeout(error):
+    from requests.exceptions import Timeout
+    return (isinstance(error, (asyncio.TimeoutError, TimeoutError, Timeout))
+            or type(error).__name__ == 'TimeoutError')  # pyppeteer.errors.TimeoutError
+
+
+def _is_connection_error(error):
+    from requests.exceptions import ConnectionError as RequestsConnectionError
+    return isinstance(error, (RequestsConnectionError, ConnectionError))
+
+
+class CircuitBreaker:
+    """单主机熔断器
+
+    最近 window 次请求中失败率达到 failure_threshold（且至少 min_requests 次）时打开，
+    打开期间直接拒绝请求；cooldown 秒后进入半开状态，只放行一个探测请求，
+    探测成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold=0.5, window=20, min_requests=5, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self._results = deque(maxlen=window)
+        self._probing = False
+
+    @property
+    def failure_rate(self):
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    def allow(self):
+        if self.state == 'open':
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = 'half_open'
+            self._probing = False
+        if self.state == 'half_open':
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, success):
+        if self.state == 'half_open':
+            self._probing = False
+            if success:
+                self.state = 'closed'
+                self._results.clear()
+            else:
+                self._open()
+            return
+        self._results.append(success)
+        if len(self._results) >= self.min_requests and self.failure_rate >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        logger.warning(f"熔断器打开，失败率 {self.failure_rate:.0%}，{self.cooldown} 秒后重新探测")
+
+
+class FetchPolicy:
+    """三个抓取方法共用的重试策略：带抖动的指数退避 + 按主机熔断
+
+    超时、连接错误、5xx、429 和验证页会在 max_retries 次内重试，
+    第 n 次重试前随机等待 [0, min(max_delay, base_delay * 2**(n-1))] 秒；
+    最终失败或熔断时抛出 FetchError。
+    """
+
+    def __init__(self, max_retries=3, base_delay=1.0, max_delay=30.0,
+                 failure_threshold=0.5, window=20, min_requests=5, cooldown=30):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._breaker_kwargs = dict(failure_threshold=failure_threshold, window=window,
+                                    min_requests=min_requests, cooldown=cooldown)
+        self.breakers = {}
+        self.retries = 0
+
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(**self._breaker_kwargs)
+        return self.breakers[host]
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def call(self, url, factory, validate=None):
+        """执行 factory() 返回的协程，按策略重试；validate 用于检查结果是否可用"""
+        breaker = self.breaker(urlsplit(url).netloc)
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                raise FetchError(url, 'circuit_open', '主机熔断中', attempts=attempt - 1)
+            try:
+                result = await factory()
+                if validate is not None:
+                    validate(result)
+            except RetryableResponse as e:
+                kind, status, message = e.kind, e.status, e.kind
+            except Exception as e:
+                if _is_timeout(e):
+                    kind, status, message = 'timeout', None, str(e) or type(e).__name__
+                elif _is_connection_error(e):
+                    kind, status, message = 'connection', None, str(e)
+                else:
+                    breaker.record(False)
+                    raise FetchError(url, type(e).__name__, str(e), attempts=attempt) from e
+            else:
+                breaker.record(True)
+                return result
+
+            breaker.record(False)
+            if attempt > self.max_retries:
+                raise FetchError(url, kind, message, status=status, attempts=attempt)
+            delay = self.backoff(attempt)
+            self.retries += 1
+            logger.info(f"{kind}，{delay:.1f} 秒后第 {attempt} 次重试: {url}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ('normal', 'replay', 'off')
+
+
+class CacheMiss(Exception):
+    """回放模式下请求的 URL 不在缓存中"""
+
+
+class CachedResponse:
+    """缓存中的一条响应，提供与 requests 响应相同的 url / status_code / content / text 属性"""
+
+    def __init__(self, url, content, encoding, etag, last_modified, fetched_at):
+        self.url = url
+        self.status_code = 200
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class ResponseCache:
+    """磁盘响应缓存：按 URL 保存原始响应体，支持 TTL、按总大小的 LRU 淘汰和条件请求
+
+    mode 为 'normal' 时正常读写缓存；'replay' 时只读缓存、完全不访问网络，
+    未命中抛出 CacheMiss；'off' 时不使用缓存。
+    元数据保存在 cache_dir/index.db，响应体按 URL 哈希分目录存放。
+    """
+
+    def __init__(self, cache_dir, ttl=3600, max_bytes=512 * 1024 * 1024, mode='normal'):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"不支持的缓存模式: {mode}，可选 {CACHE_MODES}")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(str(self.cache_dir / "index.db"))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " encoding TEXT,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    @property
+    def replay(self):
+        return self.mode == 'replay'
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return self.cache_dir / key[:2] / key
+
+    def lookup(self, url):
+        """返回缓存的响应（可能已过期），不存在时返回 None"""
+        if not self.enabled:
+            return None
+        key = self._key(url)
+        row = self.conn.execute(
+            "SELECT encoding, etag, last_modified, fetched_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            content = self._body_path(key).read_bytes()
+        except OSError:
+            self._delete(key)
+            return None
+        self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return CachedResponse(url, content, *row)
+
+    def is_fresh(self, cached):
+        return time.time() - cached.fetched_at < self.ttl
+
+    @staticmethod
+    def conditional_headers(cached):
+        """根据缓存条目生成 If-None-Match / If-Modified-Since 请求头"""
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        return headers
+
+    def refresh(self, cached):
+        """服务器返回 304 时刷新条目的抓取时间"""
+        cached.fetched_at = time.time()
+        self.conn.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                          (cached.fetched_at, cached.fetched_at, self._key(cached.url)))
+        self.conn.commit()
+        self.revalidated += 1
+
+    def store(self, url, content, headers=None, encoding=None):
+        """写入一条 200 响应，写入后按总大小做 LRU 淘汰"""
+        if not self.enabled or self.replay:
+            return
+        headers = headers or {}
+        key = self._key(url)
+        path = self._body_path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, url, size, encoding, etag, last_modified, fetched_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, len(content), encoding, headers.get('ETag'), headers.get('Last-Modified'), now, now)
+        )
+        self.conn.commit()
+        self._evict()
+
+    def discard(self, url):
+        """删除一条缓存（例如缓存中的内容是验证页）"""
+        self._delete(self._key(url))
+        self.conn.commit()
+
+    def _delete(self, key):
+        try:
+            self._body_path(key).unlink()
+        except OSError:
+            pass
+        self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._delete(key)
+            total -= size
+            evicted += 1
+        self.conn.commit()
+        logger.debug(f"响应缓存淘汰 {evicted} 个条目，当前 {total} 字节")
+
+    def close(self):
+        self.conn.close()
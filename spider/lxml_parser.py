@@ -0,0 +1,147 @@
+import json
+import logging
+import re
+
+from lxml import etree
+from lxml import html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 与 TiebaSpider 中 CSS 选择器级联相同的优先顺序，全部预编译
+_THREAD_XPATH = etree.XPath(f"//*[{_has_class('j_thread_list')}]")
+_TITLE_XPATHS = [etree.XPath(xpath) for xpath in (
+    f".//a[{_has_class('j_th_tit')}]",
+    f".//*[{_has_class('threadlist_title')}]//a",
+    f".//a[{_has_class('th_title')}]",
+)]
+_AUTHOR_XPATHS = [etree.XPath(xpath) for xpath in (
+    f".//*[{_has_class('tb_icon_author')}]",
+    f".//*[{_has_class('frs-author-name')}]",
+    f".//*[{_has_class('threadlist_author')}]",
+)]
+_REPLY_XPATHS = [etree.XPath(xpath) for xpath in (
+    f".//*[{_has_class('threadlist_rep_num')}]",
+    f".//*[{_has_class('j_reply_num')}]",
+)]
+
+
+# 帖子页：每个楼层一个 .l_post，正文在 .d_post_content，楼层号和时间在 data-field 或 .tail-info 中
+_REPLY_XPATH = etree.XPath(f"//*[{_has_class('l_post')}]")
+_REPLY_CONTENT_XPATH = etree.XPath(f".//*[{_has_class('d_post_content')}]")
+_REPLY_AUTHOR_XPATH = etree.XPath(f".//*[{_has_class('p_author_name')}]")
+_REPLY_TAIL_XPATH = etree.XPath(f".//*[{_has_class('tail-info')}]")
+_REPLY_PAGES_XPATH = etree.XPath(f"//*[{_has_class('l_reply_num')}]/span[{_has_class('red')}]")
+_FLOOR_RE = re.compile(r'^(\d+)楼$')
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}')
+
+_UTF8_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+
+def _first(element, xpaths):
+    for xpath in xpaths:
+        found = xpath(element)
+        if found:
+            return found[0]
+    return None
+
+
+def _text(element):
+    return ' '.join(element.text_content().split())
+
+
+def _parse_tree(page_html):
+    if not page_html:
+        return None
+    try:
+        try:
+            return lxml_html.fromstring(page_html)
+        except ValueError:
+            # 带 XML 编码声明的字符串 lxml 不接受，改为按 UTF-8 字节解析
+            return lxml_html.fromstring(page_html.encode('utf-8'), parser=_UTF8_PARSER)
+    except (etree.ParserError, ValueError) as e:
+        logger.debug(f"lxml 解析页面失败: {e}")
+        return None
+
+
+def parse_thread_list(page_html):
+    """一次构建 lxml 树，用预编译 XPath 取出页面中每个帖子的标题、链接、作者和回复数
+
+    返回字段字典列表，字段含义与 TiebaSpider.extract_post_fields 相同；
+    页面中没有帖子或无法解析时返回空列表，由调用方回退到 CSS 选择器级联。
+    """
+    tree = _parse_tree(page_html)
+    if tree is None:
+        return []
+
+    threads = []
+    for element in _THREAD_XPATH(tree):
+        fields = {'title': "无标题", 'post_link': "", 'author': "匿名用户", 'reply_count': "0"}
+        title_element = _first(element, _TITLE_XPATHS)
+        if title_element is not None:
+            fields['title'] = _text(title_element)
+            fields['post_link'] = title_element.get('href', '')
+        author_element = _first(element, _AUTHOR_XPATHS)
+        if author_element is not None:
+            fields['author'] = _text(author_element)
+        reply_element = _first(element, _REPLY_XPATHS)
+        if reply_element is not None:
+            fields['reply_count'] = _text(reply_element)
+        elif element.get('data-field'):
+            # 列表项的 data-field 中同样带有回复数
+            try:
+                fields['reply_count'] = str(json.loads(element.get('data-field')).get('reply_num', 0))
+            except ValueError:
+                pass
+        threads.append(fields)
+    return threads
+
+
+def parse_reply_page_count(page_html):
+    """帖子页中“回复贴，共 N 页”的 N，取不到时返回 1"""
+    tree = _parse_tree(page_html)
+    if tree is None:
+        return 1
+    numbers = [_text(element) for element in _REPLY_PAGES_XPATH(tree)]
+    if len(numbers) >= 2 and numbers[1].isdigit():
+        return max(1, int(numbers[1]))
+    return 1
+
+
+def parse_thread_replies(page_html):
+    """解析帖子页中的每个楼层，返回 {'floor', 'author', 'text', 'time'} 列表（不含没有正文的楼层）"""
+    tree = _parse_tree(page_html)
+    if tree is None:
+        return []
+
+    replies = []
+    for element in _REPLY_XPATH(tree):
+        content = _REPLY_CONTENT_XPATH(element)
+        if not content:
+            continue
+        reply = {'floor': None, 'author': "匿名用户", 'text': _text(content[0]), 'time': ""}
+        try:
+            field = json.loads(element.get('data-field') or '{}')
+        except ValueError:
+            field = {}
+        reply['floor'] = (field.get('content') or {}).get('post_no')
+        reply['time'] = (field.get('content') or {}).get('date') or ""
+        author = (field.get('author') or {}).get('user_name')
+        if not author:
+            author_element = _REPLY_AUTHOR_XPATH(element)
+            author = _text(author_element[0]) if author_element else None
+        reply['author'] = author or reply['author']
+        # 新版页面的 data-field 不带楼层号和时间，从楼层尾部的 .tail-info 中取
+        for tail in _REPLY_TAIL_XPATH(element):
+            tail_text = _text(tail)
+            floor_match = _FLOOR_RE.match(tail_text)
+            if reply['floor'] is None and floor_match:
+                reply['floor'] = int(floor_match.group(1))
+            elif not reply['time'] and _DATE_RE.match(tail_text):
+                reply['time'] = tail_text
+        replies.append(reply)
+    return replies
@@ -0,0 +1,162 @@
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 各阶段耗时直方图的桶上界（秒），与 Prometheus 客户端默认桶相近，补充了渲染常见的长耗时
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+class Histogram:
+    """固定桶的累计直方图，分位数按桶内线性插值估算（与 PromQL histogram_quantile 相同）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个是 +Inf 桶
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - cumulative) / count)
+            cumulative += count
+        return self.max
+
+    def cumulative_counts(self):
+        """按桶上界给出累计计数，末项为 +Inf"""
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.quantile(0.5), 6),
+            'p95': round(self.quantile(0.95), 6),
+            'max': round(self.max, 6),
+        }
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+
+
+class CrawlMetrics:
+    """按阶段和页面类型（probe/list/thread）记录耗时直方图、字节数和成功/失败次数
+
+    阶段: fetch 为 HTTP 请求（含缓存命中），render 为浏览器渲染（含固定等待），
+    sleep 为渲染中的固定等待，parse 为静态 HTML 构建与选择器/XPath 解析。
+    summary() 给出可序列化为 JSON 的运行摘要，export_prometheus() 写出 Prometheus 文本格式，
+    可交给 node_exporter 的 textfile collector 采集。
+    """
+
+    def __init__(self, tieba_name, buckets=DEFAULT_BUCKETS):
+        self.tieba_name = tieba_name
+        self.buckets = tuple(buckets)
+        self.durations = {}
+        self.bytes = Counter()
+        self.outcomes = Counter()
+        self.started_at = time.time()
+        self._started = time.monotonic()
+
+    def observe(self, stage, page_type, seconds):
+        key = (stage, page_type)
+        histogram = self.durations.get(key)
+        if histogram is None:
+            histogram = self.durations[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, page_type):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, page_type, time.perf_counter() - started)
+
+    def add_bytes(self, page_type, size):
+        self.bytes[page_type] += size
+
+    def record_outcome(self, page_type, success):
+        self.outcomes[(page_type, 'success' if success else 'failure')] += 1
+
+    def stage_totals(self):
+        """各阶段耗时合计（秒），用于判断时间主要花在哪里"""
+        totals = Counter()
+        for (stage, _), histogram in self.durations.items():
+            totals[stage] += histogram.sum
+        return totals
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        pages = {}
+        for (page_type, outcome), count in self.outcomes.items():
+            pages.setdefault(page_type, {'success': 0, 'failure': 0})[outcome] = count
+        return {
+            'tieba_name': self.tieba_name,
+            'started_at': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            'elapsed_seconds': round(elapsed, 3),
+            'pages': pages,
+            'bytes': dict(self.bytes),
+            'stages': {f"{stage}.{page_type}": histogram.summary()
+                       for (stage, page_type), histogram in sorted(self.durations.items())},
+        }
+
+    def export_prometheus(self, path):
+        """以 Prometheus 文本格式写出指标（先写临时文件再替换，避免采集到半个文件）"""
+        forum = self.tieba_name
+        lines = [
+            "# HELP tieba_stage_duration_seconds Time spent per crawl stage and page type.",
+            "# TYPE tieba_stage_duration_seconds histogram",
+        ]
+        for (stage, page_type), histogram in sorted(self.durations.items()):
+            labels = _labels(forum=forum, stage=stage, page_type=page_type)
+            for bound, count in histogram.cumulative_counts():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'tieba_stage_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"tieba_stage_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"tieba_stage_duration_seconds_count{{{labels}}} {histogram.count}")
+        lines += [
+            "# HELP tieba_response_bytes_total Response body bytes fetched per page type.",
+            "# TYPE tieba_response_bytes_total counter",
+        ]
+        for page_type, size in sorted(self.bytes.items()):
+            lines.append(f"tieba_response_bytes_total{{{_labels(forum=forum, page_type=page_type)}}} {size}")
+        lines += [
+            "# HELP tieba_pages_total Pages fetched per page type and outcome.",
+            "# TYPE tieba_pages_total counter",
+        ]
+        for (page_type, outcome), count in sorted(self.outcomes.items()):
+            labels = _labels(forum=forum, page_type=page_type, outcome=outcome)
+            lines.append(f"tieba_pages_total{{{labels}}} {count}")
+
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        tmp_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        tmp_path.replace(path)
+        return str(path)
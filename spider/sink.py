@@ -0,0 +1,79 @@
+import gzip
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _open_text(path, mode, compress):
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def iter_jsonl(path, compress=None):
+    """逐行读取 JSONL 文件，每次只在内存中保留一条记录；compress 为 None 时按 .gz 后缀判断"""
+    path = Path(path)
+    if compress is None:
+        compress = path.suffix == '.gz'
+    with _open_text(path, 'r', compress) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_json_array(records, path):
+    """逐条把记录写成 JSON 数组文件，输出格式与 json.dump(records, indent=2) 相同，返回写出条数"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for record in records:
+            f.write(',\n' if count else '\n')
+            # 不用 textwrap.indent：它按 str.splitlines() 分行，会在字符串值里的 U+2028 等字符后插入缩进；
+            # JSON 字符串中的换行都已转义，输出中的 \n 只会出现在结构之间
+            f.write('  ' + json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+            count += 1
+        f.write('\n]' if count else ']')
+    return count
+
+
+def replies_path_for(path):
+    """帖子结果文件对应的回复文件路径：x.jsonl -> x_replies.jsonl，x.jsonl.gz -> x_replies.jsonl.gz"""
+    path = Path(path)
+    stem, _, suffix = path.name.partition('.')
+    return path.with_name(f"{stem}_replies.{suffix or 'jsonl'}")
+
+
+class JsonlSink:
+    """流式记录写出器：每条记录产生后立即以一行 JSON 追加到文件并刷盘
+
+    compress 为 None 时按文件后缀（.gz）自动判断是否 gzip 压缩；
+    append=True 时在已有文件末尾继续写入。close() 之后再次 write() 会以追加方式重新打开。
+    """
+
+    def __init__(self, path, compress=None, append=False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compress = self.path.suffix == '.gz' if compress is None else compress
+        self.count = 0
+        self._file = _open_text(self.path, 'a' if append else 'w', self.compress)
+
+    def write(self, record):
+        if self._file is None:
+            self._file = _open_text(self.path, 'a', self.compress)
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def __iter__(self):
+        """读回已写出的全部记录（gzip 需要写完尾部才能完整读取，因此先关闭文件）"""
+        self.close()
+        return iter_jsonl(self.path, self.compress)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"已写出 {self.count} 条记录到: {self.path}")
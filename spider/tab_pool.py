@@ -0,0 +1,101 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Tab:
+    """池中的一个标签页及其已渲染次数"""
+
+    __slots__ = ('page', 'renders')
+
+    def __init__(self):
+        self.page = None
+        self.renders = 0
+
+
+class BrowserTabPool:
+    """预热的无头浏览器标签页池，替代 arender 每次新开页面的做法
+
+    池中固定 size 个标签页循环复用：同一时刻最多 size 个渲染在进行，
+    单个标签页渲染满 max_renders 次后关闭重开以限制 Chromium 内存增长，
+    渲染超过 render_timeout 秒的标签页直接回收，不会拖住后续任务。
+    浏览器实例取自传入的 AsyncHTMLSession，随 session.close() 一起关闭。
+    """
+
+    def __init__(self, session, size=4, max_renders=50, render_timeout=20):
+        if size < 1:
+            raise ValueError("size 必须大于等于 1")
+        self.session = session
+        self.size = size
+        self.max_renders = max_renders
+        self.render_timeout = render_timeout
+        self.recycled = 0
+        self._browser = None
+        self._idle = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        """启动浏览器并预热全部标签页，可重复调用"""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            self._browser = await self.session.browser
+            idle = asyncio.Queue()
+            for _ in range(self.size):
+                tab = _Tab()
+                tab.page = await self._browser.newPage()
+                idle.put_nowait(tab)
+            self._idle = idle
+            logger.info(f"浏览器标签页池已就绪，共 {self.size} 个标签页")
+
+    async def _retire(self, tab):
+        """关闭标签页，下次取用时再新开"""
+        page, tab.page, tab.renders = tab.page, None, 0
+        self.recycled += 1
+        if page is not None:
+            try:
+                await page.close()
+            except Exception as e:
+                logger.debug(f"关闭标签页失败: {e}")
+
+    async def _load(self, page, url, sleep, timeout, user_agent):
+        if user_agent:
+            await page.setUserAgent(user_agent)
+        await page.goto(url, options={'timeout': int(timeout * 1000)})
+        if sleep:
+            await asyncio.sleep(sleep)
+        return await page.content()
+
+    async def render(self, url, sleep=0, timeout=None, user_agent=None):
+        """在空闲标签页中打开 url 并返回渲染后的 HTML，超时抛出 asyncio.TimeoutError"""
+        await self.start()
+        timeout = timeout or self.render_timeout
+        tab = await self._idle.get()
+        healthy = False
+        try:
+            if tab.page is None:
+                tab.page = await self._browser.newPage()
+            content = await asyncio.wait_for(self._load(tab.page, url, sleep, timeout, user_agent),
+                                             timeout + sleep)
+            tab.renders += 1
+            healthy = tab.renders < self.max_renders
+        finally:
+            if not healthy:
+                await self._retire(tab)
+            self._idle.put_nowait(tab)
+        from requests_html import HTML
+        return HTML(url=url, html=content)
+
+    async def close(self):
+        """关闭池中所有标签页（浏览器本身由 session 负责关闭）"""
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            tab = self._idle.get_nowait()
+            if tab.page is not None:
+                try:
+                    await tab.page.close()
+                except Exception as e:
+                    logger.debug(f"关闭标签页失败: {e}")
+        self._idle = None
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(content):
+    return hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+
+
+class ThreadIndex:
+    """本地帖子索引（SQLite），以 post_url 为键记录上次抓取到的回复数、内容哈希和抓取时间
+
+    回复数没有变化的帖子可以直接复用索引中的内容，不必再请求帖子页。
+    """
+
+    def __init__(self, db_path, commit_every=100):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = str(db_path)
+        self.commit_every = commit_every
+        self._pending = 0
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS threads ("
+            " post_url TEXT PRIMARY KEY,"
+            " reply_count TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " crawl_time TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, post_url):
+        """返回索引中的记录字典，不存在时返回 None"""
+        row = self.conn.execute(
+            "SELECT reply_count, content_hash, content, crawl_time FROM threads WHERE post_url = ?",
+            (post_url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('reply_count', 'content_hash', 'content', 'crawl_time'), row), post_url=post_url)
+
+    def get_unchanged(self, post_url, reply_count):
+        """回复数与上次一致时返回索引记录，否则返回 None（新帖或活跃帖需要重新抓取）"""
+        entry = self.get(post_url)
+        if entry is not None and entry['reply_count'] == str(reply_count):
+            return entry
+        return None
+
+    def update(self, post_url, reply_count, content, crawl_time):
+        """写入或更新一条帖子记录，返回内容是否发生了变化"""
+        new_hash = content_hash(content)
+        entry = self.get(post_url)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO threads (post_url, reply_count, content_hash, content, crawl_time)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (post_url, str(reply_count), new_hash, content or '', crawl_time)
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+        return entry is None or entry['content_hash'] != new_hash
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,74 @@
+import json
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 触发乘性减的信号：慢响应、验证页/限流、选择器为空、请求出错
+CONGESTION_SIGNALS = ('slow', 'anti_bot', 'rate_limited', 'http_5xx', 'empty', 'error')
+
+
+class AIMDController:
+    """加性增、乘性减（AIMD）的自适应并发控制器
+
+    每攒够 limit 次健康的响应（延迟不超过 latency_target 且无异常信号），并发上限加 increase；
+    收到拥塞信号时上限乘以 decrease。一次下调后要再完成 limit 次请求才允许下一次下调，
+    避免同一批在途请求的连续失败把上限一路砍到底。limit 始终在 [minimum, maximum] 之间。
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, increase=1, decrease=0.5,
+                 latency_target=8.0, history_size=1000):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.limit = max(minimum, min(maximum, initial))
+        # 调度器按 limit / initial 的比例缩放单主机限速
+        self.initial = self.limit
+        self.history = deque(maxlen=history_size)
+        self.signals = {}
+        self._healthy = 0
+        self._since_decrease = self.limit
+        self._log('init')
+
+    def _log(self, reason):
+        self.history.append({'time': round(time.time(), 3), 'limit': self.limit, 'reason': reason})
+
+    def record(self, latency, signal=None):
+        """记录一次完成的请求；signal 为 None 表示成功，否则为 CONGESTION_SIGNALS 之一"""
+        if signal is None and latency > self.latency_target:
+            signal = 'slow'
+        self._since_decrease += 1
+        if signal is not None:
+            self.signals[signal] = self.signals.get(signal, 0) + 1
+            self._healthy = 0
+            if self._since_decrease >= self.limit:
+                new_limit = max(self.minimum, int(self.limit * self.decrease))
+                self._since_decrease = 0
+                if new_limit != self.limit:
+                    logger.info(f"检测到 {signal}，并发上限 {self.limit} -> {new_limit}")
+                    self.limit = new_limit
+                    self._log(signal)
+            return
+        self._healthy += 1
+        if self._healthy >= self.limit and self.limit < self.maximum:
+            self._healthy = 0
+            self.limit = min(self.maximum, self.limit + self.increase)
+            self._log('increase')
+
+    def snapshot(self):
+        """当前并发上限、信号统计和调整历史"""
+        return {
+            'limit': self.limit,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'signals': dict(self.signals),
+            'history': list(self.history),
+        }
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
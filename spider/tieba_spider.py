@@ -1,27 +1,504 @@
 import asyncio
-import pandas as pd
+import heapq
 import time
 import random
-from requests_html import AsyncHTMLSession, HTML
-from fake_useragent import UserAgent
 import logging
-from urllib.parse import urlencode, urljoin
+from urllib.parse import urlencode, urljoin, urlsplit
 import json
 import re
+from collections import Counter, deque
+from functools import lru_cache
+from itertools import chain, count, islice
+from pathlib import Path
+
+from .checkpoint import CrawlCheckpoint
+from .fetch_policy import FetchError, FetchPolicy, RetryableResponse, check_html, check_response
+from .http_cache import CacheMiss, ResponseCache
+from .metrics import CrawlMetrics
+from .sink import JsonlSink, replies_path_for, write_json_array
+from .tab_pool import BrowserTabPool
+from .thread_index import ThreadIndex
+from .throttle import AIMDController
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 贴吧常把帖子列表等内容以 HTML 注释形式藏在 <code> 块里，由前端脚本再展开
+_HIDDEN_HTML_RE = re.compile(r'<code[^>]*>\s*<!--(.*?)-->\s*</code>', re.S)
+
+# 随包附带的 User-Agent 列表，替代每次实例化都要加载数据的 fake_useragent
+USER_AGENTS_FILE = Path(__file__).with_name("user_agents.txt")
+
+
+@lru_cache(maxsize=None)
+def load_user_agents(path=USER_AGENTS_FILE):
+    """读取 User-Agent 列表（每个进程只读一次）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        agents = tuple(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    if not agents:
+        raise ValueError(f"User-Agent 列表为空: {path}")
+    return agents
+
+# 判断静态 HTML 是否已包含所需数据的选择器（按页面类型）
+LIST_PAGE_SELECTOR = '.j_thread_list'
+CONTENT_SELECTORS = ['.d_post_content', '.post_content', '.j_d_post_content', '.core_reply_content', '.l_post_content']
+
+# 调度优先级档位，数值越小越先执行：探测总页数 > 列表页 > 帖子（档内按回复数从高到低）> 低价值帖子
+PRIORITY_PROBE = 0
+PRIORITY_LIST = 1
+PRIORITY_THREAD = 2
+PRIORITY_LOW_VALUE = 3
+
+
+def reply_count_value(reply_count):
+    """把列表页上的回复数（如 "130"、"1.2万"）转换为整数，无法识别时为 0"""
+    text = str(reply_count).strip()
+    try:
+        if text.endswith('万'):
+            return int(float(text[:-1]) * 10000)
+        return int(text)
+    except ValueError:
+        return 0
+
+
+def thread_priority(reply_count, low_value_replies=0):
+    """帖子请求的优先级：回复数越多越靠前，回复数不超过 low_value_replies 的帖子排在最后"""
+    replies = reply_count_value(reply_count)
+    tier = PRIORITY_LOW_VALUE if replies <= low_value_replies else PRIORITY_THREAD
+    return (tier, -replies)
+
+
+def _is_valid_response(response):
+    """响应能否通过 check_response（不是 5xx/429/验证页），决定能否写入或使用缓存"""
+    try:
+        check_response(response)
+    except RetryableResponse:
+        return False
+    return True
+
+
+class _FairQueue:
+    """按 owner 分组的优先级轮询队列
+
+    每个 owner 一个最小堆，priority 为 (档位, 档内排序)，同优先级按入队顺序。
+    出队时先找出各 owner 队首中最高的档位，再在处于该档位的 owner 之间轮流取任务：
+    高档位的任务总是先执行，同一档位内任务量大的 owner 不会饿死其他 owner。
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._owners = deque()
+        self._seq = count()
+        self._count = asyncio.Semaphore(0)
+
+    def put_nowait(self, owner, item, priority=(PRIORITY_THREAD, 0)):
+        heap = self._queues.get(owner)
+        if heap is None:
+            heap = self._queues[owner] = []
+            self._owners.append(owner)
+        heapq.heappush(heap, (priority, next(self._seq), item))
+        self._count.release()
+
+    def _pop(self):
+        tier = min(self._queues[owner][0][0][0] for owner in self._owners)
+        while True:
+            owner = self._owners.popleft()
+            heap = self._queues[owner]
+            if heap[0][0][0] == tier:
+                break
+            self._owners.append(owner)
+        item = heapq.heappop(heap)[2]
+        if heap:
+            self._owners.append(owner)
+        else:
+            del self._queues[owner]
+        return item
+
+    async def get(self):
+        await self._count.acquire()
+        return self._pop()
+
+    def drain(self):
+        """取出所有尚未出队的任务并清空队列"""
+        items = [entry[2] for heap in self._queues.values() for entry in heap]
+        self._queues.clear()
+        self._owners.clear()
+        self._count = asyncio.Semaphore(0)
+        return items
+
+
+class CrawlScheduler:
+    """抓取调度器：列表页与帖子页请求统一交给固定大小的工作协程池执行
+
+    concurrency 为全局并发上限；per_host_rate 为单个主机每秒最多发起的请求数，
+    为 None 或 0 时不限速。提交的任务应只包含一次网络请求/渲染，
+    不要在任务内部再等待其他提交的任务，否则工作协程会被占满而死锁。
+    任务按 priority 出队（见 PRIORITY_* 档位），多个贴吧共用一个调度器时，
+    同一档位内按 owner（贴吧名）轮询出队，保证公平。
+    传入 controller（AIMDController）时，同时执行的任务数由 controller.limit 动态决定，
+    concurrency 不再生效；per_host_rate 只是初始速率，实际限速随 limit 按比例升降
+    （上限翻倍则速率翻倍，收到拥塞信号减半时速率也减半）。
+    """
+
+    def __init__(self, concurrency=8, per_host_rate=4.0, controller=None):
+        if concurrency < 1:
+            raise ValueError("concurrency 必须大于等于 1")
+        self.concurrency = concurrency
+        self.controller = controller
+        self.per_host_interval = 1.0 / per_host_rate if per_host_rate else 0.0
+        self._queue = None
+        self._workers = []
+        self._host_next = {}
+        self._active = 0
+        self._slots = None
+
+    @property
+    def limit(self):
+        """当前允许同时执行的任务数"""
+        return self.controller.limit if self.controller is not None else self.concurrency
+
+    @property
+    def host_interval(self):
+        """当前的单主机请求间隔（秒），0 表示不限速"""
+        if self.controller is None or not self.per_host_interval:
+            return self.per_host_interval
+        return self.per_host_interval * self.controller.initial / self.controller.limit
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = _FairQueue()
+            self._slots = asyncio.Condition()
+        self._workers = [w for w in self._workers if not w.done()]
+        pool_size = self.controller.maximum if self.controller is not None else self.concurrency
+        for _ in range(pool_size - len(self._workers)):
+            self._workers.append(asyncio.ensure_future(self._worker()))
+
+    async def submit(self, url, func, *args, owner=None, priority=(PRIORITY_THREAD, 0), **kwargs):
+        """提交一个抓取任务并等待其结果，任务中的异常原样抛回调用方
+
+        调用方被取消时任务随之作废：仍在排队的任务出队后直接丢弃，不会再发起请求。
+        """
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(owner, (url, func, args, kwargs, future), priority)
+        return await future
+
+    async def _throttle_host(self, host):
+        """按主机预约下一个可用的发送时间点，保证单主机请求间隔"""
+        interval = self.host_interval
+        if not interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._host_next.get(host, 0.0))
+        self._host_next[host] = slot + interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self):
+        while True:
+            # 工作协程数按最大并发创建，实际同时执行的数量受 limit 约束。先拿到执行名额再出队：
+            # 等待名额的任务留在队列里，之后提交的列表页等高优先级任务仍能排到它们前面
+            async with self._slots:
+                await self._slots.wait_for(lambda: self._active < self.limit)
+                self._active += 1
+            future = None
+            try:
+                url, func, args, kwargs, future = await self._queue.get()
+                if future.done():
+                    continue
+                await self._throttle_host(urlsplit(url).netloc)
+                # 等待限速期间调用方可能已经取消
+                if future.done():
+                    continue
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                if future is not None:
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                async with self._slots:
+                    self._active -= 1
+                    self._slots.notify_all()
+
+    async def close(self):
+        """停止工作协程，并取消仍在排队的任务"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue is not None:
+            for *_, future in self._queue.drain():
+                future.cancel()
+
+
 class TiebaSpider:
-    def __init__(self, tieba_name):
+    def __init__(self, tieba_name, concurrency=8, per_host_rate=4.0, static_first=True,
+                 tab_pool_size=4, tab_max_renders=50, index_path=None,
+                 cache_dir=None, cache_ttl=3600, cache_mode='normal', sink_path=None, sink_compress=None, sink_append=False,
+                 fetch_policy=None, session=None, scheduler=None, tab_pool=None, parse_backend='lxml',
+                 checkpoint_path=None, resume=False, checkpoint_interval=30,
+                 adaptive=True, max_concurrency=32, site_root="https://tieba.baidu.com",
+                 full_thread=False, reply_sink_path=None, reply_page_concurrency=4, max_reply_pages=None,
+                 low_value_replies=0):
         self.tieba_name = tieba_name
-        self.base_url = "https://tieba.baidu.com/f"
-        self.session = AsyncHTMLSession()
-        self.ua = UserAgent()
+        # site_root: 站点根地址，基准测试时指向本地替身服务器
+        self.site_root = site_root.rstrip('/')
+        self.base_url = f"{self.site_root}/f"
+        # session / scheduler / tab_pool 可由 crawl_many 传入供多个贴吧共用，共用的资源由传入方负责关闭
+        self._owns_session = session is None
+        self._owns_scheduler = scheduler is None
+        self._owns_tab_pool = tab_pool is None
+        # requests_html、pyppeteer 等重量级依赖在第一次请求时才导入，见 session / tab_pool 属性
+        self._session = session
+        self.user_agents = load_user_agents()
+        # cache_dir: 原始响应缓存目录；cache_mode='replay' 时全部请求都从缓存回放，不访问网络
+        self.cache = ResponseCache(cache_dir, ttl=cache_ttl, mode=cache_mode) if cache_dir else None
+        if self.cache is not None and self.cache.replay:
+            per_host_rate = None
+        # adaptive: 由 AIMD 控制器根据延迟、验证页和空结果自动调整并发和单主机限速，
+        # concurrency 和 per_host_rate 只作为初始值
+        if scheduler is None:
+            controller = AIMDController(initial=concurrency, maximum=max(concurrency, max_concurrency)) if adaptive else None
+            scheduler = CrawlScheduler(concurrency=concurrency, per_host_rate=per_host_rate, controller=controller)
+        self.scheduler = scheduler
+        # 重试、退避与熔断策略；最终失败的请求以结构化形式记录在 errors 中
+        self.fetch_policy = fetch_policy or FetchPolicy()
+        self.errors = []
+        # 分阶段（请求/渲染/固定等待/解析）耗时直方图、字节数和各类页面成功/失败次数
+        self.metrics = CrawlMetrics(tieba_name)
+        # 需要渲染时复用固定数量的浏览器标签页，而不是每个响应新开一个
+        self._tab_pool = tab_pool
+        self._tab_pool_size = tab_pool_size
+        self._tab_max_renders = tab_max_renders
+        # static_first: 先直接解析原始 HTML，选择器为空时才调用 arender
+        self.static_first = static_first
+        self.static_hits = Counter()
+        self.render_fallbacks = Counter()
+        # parse_backend='lxml': 整页一次性用预编译 XPath 解析帖子列表，解析不到时回退到 CSS 选择器级联
+        self.parse_backend = parse_backend
+        # index_path: 增量抓取用的帖子索引，回复数未变化的帖子不再请求内容页
+        self.thread_index = ThreadIndex(index_path) if index_path else None
+        self.index_skips = 0
+        # checkpoint_path: 定期保存爬取断点；resume=True 时从未完成的断点继续，
+        # 并沿用断点中的 sink 文件追加写入。断点只记录进度，帖子内容依赖 sink 落盘
+        self.checkpoint = None
+        if checkpoint_path:
+            previous = CrawlCheckpoint.load(checkpoint_path, interval=checkpoint_interval) if resume else None
+            if previous is not None and not previous.finished and previous.tieba_name == tieba_name:
+                previous.recover_from_sink()
+                logger.info(f"从断点继续: 已完成 {len(previous.completed_pages)}/{len(previous.planned_pages)} 页，"
+                            f"{previous.total_posts} 个帖子")
+                self.checkpoint = previous
+                sink_path = previous.sink_path or sink_path
+                sink_append = True
+            else:
+                sink_path = sink_path or Path(checkpoint_path).with_suffix('.jsonl')
+                self.checkpoint = CrawlCheckpoint(checkpoint_path, tieba_name, sink_path, interval=checkpoint_interval)
+        # sink_path: 每条帖子产生后立即写入该 JSONL 文件，不再在内存中累积 posts_data
+        self.sink = JsonlSink(sink_path, compress=sink_compress, append=sink_append) if sink_path else None
         self.posts_data = []
+        self.total_posts = self.checkpoint.total_posts if self.checkpoint is not None else 0
+        # full_thread: 逐页抓取帖子的全部回复，每个楼层作为一条回复记录立即写入 reply_sink；
+        # 同一帖子最多 reply_page_concurrency 个回复页同时在途，max_reply_pages 限制每帖抓取的页数
+        self.full_thread = full_thread
+        self.reply_page_concurrency = max(1, reply_page_concurrency)
+        self.max_reply_pages = max_reply_pages
+        self.reply_sink = None
+        if full_thread:
+            if not reply_sink_path:
+                reply_sink_path = (replies_path_for(sink_path) if sink_path else
+                                   f"{tieba_name}_replies_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+            self.reply_sink = JsonlSink(reply_sink_path, compress=sink_compress, append=sink_append)
+        self.total_replies = 0
+        # 回复数不超过 low_value_replies 的帖子按低价值帖子调度，排在其他帖子之后
+        self.low_value_replies = low_value_replies
+        self.budget_exhausted = False
         
+    @property
+    def session(self):
+        """首次使用时才导入 requests_html 并创建会话"""
+        if self._session is None:
+            from requests_html import AsyncHTMLSession
+            self._session = AsyncHTMLSession()
+        return self._session
+
+    @property
+    def tab_pool(self):
+        """首次需要渲染时才创建标签页池"""
+        if self._tab_pool is None:
+            self._tab_pool = BrowserTabPool(self.session, size=self._tab_pool_size,
+                                            max_renders=self._tab_max_renders)
+        return self._tab_pool
+
     def get_headers(self):
-        return {'User-Agent': self.ua.random}
+        return {'User-Agent': random.choice(self.user_agents)}
+
+    async def _fetch_response(self, url, timeout):
+        """只发起 HTTP 请求（优先走响应缓存），只在调度器的工作协程中调用"""
+        if self.cache is None or not self.cache.enabled:
+            return await self.session.get(url, headers=self.get_headers(), timeout=timeout)
+
+        cached = self.cache.lookup(url)
+        if cached is not None and not _is_valid_response(cached):
+            # 以前缓存下来的验证页不能再提供，删除后按未命中处理
+            self.cache.discard(url)
+            cached = None
+        if cached is not None and (self.cache.replay or self.cache.is_fresh(cached)):
+            self.cache.hits += 1
+            return cached
+        if self.cache.replay:
+            self.cache.misses += 1
+            raise CacheMiss(url)
+
+        headers = self.get_headers()
+        headers.update(self.cache.conditional_headers(cached))
+        response = await self.session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            self.cache.refresh(cached)
+            return cached
+        self.cache.misses += 1
+        # 验证页同样是 200，只缓存通过检查的响应，否则重试会一直拿到同一个验证页
+        if response.status_code == 200 and _is_valid_response(response):
+            self.cache.store(url, response.content, response.headers, encoding=response.encoding)
+        return response
+
+    @property
+    def throttle(self):
+        """调度器上的 AIMD 控制器，未开启自适应时为 None"""
+        return self.scheduler.controller
+
+    async def _observed(self, stage, page_type, func, check, *args):
+        """执行一次请求/渲染，记录该阶段耗时，并把耗时和拥塞信号反馈给 AIMD 控制器
+
+        只在调度器的工作协程中调用，因此耗时不含排队等待；每次重试都单独计时。
+        """
+        started = time.monotonic()
+        try:
+            result = await func(*args)
+        except Exception:
+            elapsed = time.monotonic() - started
+            self.metrics.observe(stage, page_type, elapsed)
+            if self.throttle is not None:
+                self.throttle.record(elapsed, 'error')
+            raise
+        elapsed = time.monotonic() - started
+        self.metrics.observe(stage, page_type, elapsed)
+        if self.throttle is not None and not getattr(result, 'from_cache', False):
+            signal = None
+            try:
+                check(result)
+            except RetryableResponse as e:
+                signal = e.kind
+            self.throttle.record(elapsed, signal)
+        return result
+
+    async def _render(self, url, render_timeout, sleep):
+        """在标签页池中渲染页面，只在调度器的工作协程中调用"""
+        return await self.tab_pool.render(url, sleep=sleep, timeout=render_timeout,
+                                          user_agent=self.get_headers()['User-Agent'])
+
+    @staticmethod
+    def _static_html(text, url):
+        """把藏在 <code><!-- --></code> 中的内容展开后直接构造 HTML，不经过浏览器"""
+        from requests_html import HTML
+        return HTML(html=_HIDDEN_HTML_RE.sub(r'\1', text), url=url)
+
+    def record_error(self, error, page_type):
+        """记录一次最终失败的抓取"""
+        if not isinstance(error, FetchError):
+            error = FetchError(getattr(error, 'url', ''), type(error).__name__, str(error))
+        entry = error.to_dict()
+        entry['page_type'] = page_type
+        self.errors.append(entry)
+        logger.warning(f"{page_type} 页抓取失败 [{error.kind}] {error.url}: {error.message}")
+
+    async def fetch_html(self, url, selector, page_type, timeout=15, render_timeout=20, sleep=3,
+                         priority=(PRIORITY_THREAD, 0)):
+        """经调度器获取页面，受全局并发上限和单主机限速约束
+
+        static_first 打开时先解析原始 HTML，selector 能匹配到元素就直接返回；
+        否则回退到 arender，并在 render_fallbacks[page_type] 上计数。
+        请求和渲染都按 fetch_policy 重试，最终失败抛出 FetchError。
+        priority 决定请求在调度器中的出队顺序。
+        """
+        _, html = await self.fetch_parsed(url, None, selector, page_type, timeout, render_timeout, sleep, priority)
+        return html
+
+    async def fetch_parsed(self, url, parse, selector, page_type, timeout=15, render_timeout=20, sleep=3,
+                           priority=(PRIORITY_THREAD, 0)):
+        """与 fetch_html 相同，但先用 parse（接收 HTML 文本、返回列表的整页解析函数）解析展开后的原始 HTML
+
+        结果非空即为静态命中，返回 (结果, None)，不再构造 requests_html 对象；否则按 fetch_html 的
+        流程（CSS 选择器探测、渲染回退）取得页面，返回 (parse(页面 HTML), HTML 对象)。
+        parse 为 None 时返回 (None, HTML 对象)。
+        """
+        try:
+            result = await self._fetch_html(url, selector, page_type, timeout, render_timeout, sleep, priority, parse)
+        except Exception:
+            self.metrics.record_outcome(page_type, False)
+            raise
+        self.metrics.record_outcome(page_type, True)
+        return result
+
+    def _parse_html(self, parse, html, page_type):
+        if parse is None:
+            return None
+        with self.metrics.timer('parse', page_type):
+            return parse(html.html)
+
+    async def _fetch_html(self, url, selector, page_type, timeout, render_timeout, sleep, priority, parse=None):
+        response = await self.fetch_policy.call(
+            url, lambda: self.scheduler.submit(url, self._observed, 'fetch', page_type, self._fetch_response,
+                                               check_response, url, timeout, owner=self.tieba_name,
+                                               priority=priority),
+            validate=check_response
+        )
+        self.metrics.add_bytes(page_type, len(response.content or b''))
+        parsed = None
+        if self.static_first:
+            with self.metrics.timer('parse', page_type):
+                if parse is not None:
+                    # 直接解析展开后的原始文本，命中时整页只构建这一次 lxml 树
+                    text = _HIDDEN_HTML_RE.sub(r'\1', response.text)
+                    parsed = parse(text)
+                    if parsed:
+                        self.static_hits[page_type] += 1
+                        return parsed, None
+                    html = self._static_html(text, url)
+                else:
+                    html = self._static_html(response.text, url)
+                found = html.find(selector, first=True)
+            if found:
+                self.static_hits[page_type] += 1
+                return parsed, html
+            self.render_fallbacks[page_type] += 1
+        if self.cache is not None and self.cache.replay:
+            # 回放模式不访问网络（渲染也会打开页面），只能使用静态解析结果
+            if not self.static_first:
+                with self.metrics.timer('parse', page_type):
+                    html = self._static_html(response.text, url)
+                return self._parse_html(parse, html, page_type), html
+            return parsed, html
+        logger.debug(f"静态解析未命中或未开启，使用渲染: {url}")
+        html = await self.fetch_policy.call(
+            url, lambda: self.scheduler.submit(url, self._observed, 'render', page_type, self._render,
+                                               check_html, url, render_timeout, sleep, owner=self.tieba_name,
+                                               priority=priority),
+            validate=check_html
+        )
+        # 渲染耗时中包含固定等待，单独记一份以便区分浏览器本身的开销
+        self.metrics.observe('sleep', page_type, sleep)
+        if self.throttle is not None and not html.find(selector, first=True):
+            # 渲染后仍然取不到数据，多半是被限流或返回了降级页面
+            self.throttle.record(0, 'empty')
+        return self._parse_html(parse, html, page_type), html
         
     async def get_total_pages(self):
         """【翻页】采用最初版本稳定翻页逻辑"""
@@ -29,15 +506,16 @@ class TiebaSpider:
             params = {'kw': self.tieba_name, 'ie': 'utf-8'}
             url = f"{self.base_url}?{urlencode(params)}"
             logger.info(f"正在获取贴吧总页数: {url}")
-            response = await self.session.get(url, headers=self.get_headers(), timeout=10)
-            await response.html.arender(timeout=20, sleep=2)
+            # 分页信息与帖子列表在同一个 pagelet 中，能解析出列表即说明分页也在静态 HTML 里
+            html = await self.fetch_html(url, LIST_PAGE_SELECTOR, 'probe', timeout=10, render_timeout=20, sleep=2,
+                                         priority=(PRIORITY_PROBE, 0))
             
-            page_elements = response.html.find('.th_footer_1 .last')
+            page_elements = html.find('.th_footer_1 .last')
             if page_elements:
                 page_url = page_elements[0].attrs.get('href', '')
                 total_pages = int(page_url.split('=')[-1]) if 'pn=' in page_url else 1
             else:
-                page_links = response.html.find('.pagination .page')
+                page_links = html.find('.pagination .page')
                 if page_links:
                     total_pages = max([int(link.text) for link in page_links if link.text.isdigit()])
                 else:
@@ -45,167 +523,403 @@ class TiebaSpider:
                     
             logger.info(f"贴吧 '{self.tieba_name}' 总页数: {total_pages}")
             return total_pages
+        except FetchError as e:
+            self.record_error(e, 'probe')
+            return 1
         except Exception as e:
             logger.error(f"获取总页数失败: {e}")
             return 1
             
+    async def fetch_page_threads(self, page_num):
+        """抓取一页帖子列表，只解析列表项字段、不抓取帖子内容；失败时抛出 FetchError"""
+        params = {'kw': self.tieba_name, 'ie': 'utf-8', 'pn': (page_num - 1) * 50}
+        url = f"{self.base_url}?{urlencode(params)}"
+        logger.info(f"正在抓取第 {page_num} 页: {url}")
+        
+        parse = None
+        if self.parse_backend == 'lxml':
+            from .lxml_parser import parse_thread_list as parse
+        # lxml 解析到帖子即为静态命中，不再构造 requests_html 对象；否则回退到 CSS 选择器级联
+        threads, html = await self.fetch_parsed(url, parse, LIST_PAGE_SELECTOR, 'list', timeout=15,
+                                                render_timeout=25, sleep=3, priority=(PRIORITY_LIST, page_num))
+        if not threads:
+            with self.metrics.timer('parse', 'list'):
+                threads = [self.extract_post_fields(post_element) for post_element in html.find(LIST_PAGE_SELECTOR)]
+        return threads
+
+    def post_url(self, post_link):
+        return f"{self.site_root}{post_link}" if post_link else ''
+
+    async def _crawl_page(self, page_num):
+        """抓取一页：每个帖子完成后立即写出并记入断点，整页完成后标记该页，返回写出条数"""
+        try:
+            threads = await self.fetch_page_threads(page_num)
+        except FetchError as e:
+            self.record_error(e, 'list')
+            return 0
+        if self.checkpoint is not None:
+            threads = [fields for fields in threads
+                       if not self.checkpoint.thread_done(self.post_url(fields['post_link']))]
+        count = 0
+        tasks = [asyncio.ensure_future(self.build_post(fields)) for fields in threads]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                post = await finished
+                if post:
+                    self.emit(post)
+                    count += 1
+        finally:
+            # 时间预算用完（或被中断）时本页被取消，尚未完成的帖子一并取消，不再写出
+            for task in tasks:
+                task.cancel()
+        if self.checkpoint is not None:
+            self.checkpoint.mark_page(page_num)
+        logger.info(f"第 {page_num} 页抓取到 {count} 个帖子")
+        return count
+
     async def fetch_page_posts(self, page_num):
         """【翻页】采用最初版本获取帖子列表逻辑"""
         try:
-            params = {'kw': self.tieba_name, 'ie': 'utf-8', 'pn': (page_num - 1) * 50}
-            url = f"{self.base_url}?{urlencode(params)}"
-            logger.info(f"正在抓取第 {page_num} 页: {url}")
-            
-            response = await self.session.get(url, headers=self.get_headers(), timeout=15)
-            await response.html.arender(timeout=25, sleep=3)
-            
+            threads = await self.fetch_page_threads(page_num)
+            # 各帖子内容并发提交给调度器，实际并发度由调度器控制
+            results = await asyncio.gather(*(self.build_post(fields) for fields in threads),
+                                           return_exceptions=True)
             posts = []
-            post_elements = response.html.find('.j_thread_list')
-            
-            for post_element in post_elements:
-                try:
-                    post_data = await self.parse_post_element(post_element)
-                    if post_data:
-                        posts.append(post_data)
-                except Exception as e:
-                    logger.warning(f"解析帖子元素失败: {e}")
-                    continue
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"解析帖子元素失败: {result}")
+                elif result:
+                    posts.append(result)
                     
             logger.info(f"第 {page_num} 页抓取到 {len(posts)} 个帖子")
             return posts
+        except FetchError as e:
+            self.record_error(e, 'list')
+            return []
         except Exception as e:
             logger.error(f"抓取第 {page_num} 页失败: {e}")
             return []
             
+    @staticmethod
+    def extract_post_fields(post_element):
+        """【内容】采用上传文件版本解析帖子元素逻辑，按 CSS 选择器级联取出列表项字段"""
+        title = "无标题"
+        post_link = ""
+        title_selectors = ['a.j_th_tit', '.threadlist_title a', 'a.th_title']
+        for selector in title_selectors:
+            title_element = post_element.find(selector, first=True)
+            if title_element:
+                title = title_element.text.strip()
+                post_link = title_element.attrs.get('href', '')
+                break
+        
+        author = "匿名用户"
+        author_selectors = ['.tb_icon_author', '.frs-author-name', '.threadlist_author']
+        for selector in author_selectors:
+            author_element = post_element.find(selector, first=True)
+            if author_element:
+                author = author_element.text.strip()
+                break
+        
+        reply_count = "0"
+        reply_selectors = ['.threadlist_rep_num', '.j_reply_num']
+        for selector in reply_selectors:
+            reply_element = post_element.find(selector, first=True)
+            if reply_element:
+                reply_count = reply_element.text.strip()
+                break
+        
+        return {'title': title, 'post_link': post_link, 'author': author, 'reply_count': reply_count}
+
     async def parse_post_element(self, post_element):
-        """【内容】采用上传文件版本解析帖子元素逻辑"""
+        """解析单个列表项并抓取其内容"""
         try:
-            title = "无标题"
-            post_link = ""
-            title_selectors = ['a.j_th_tit', '.threadlist_title a', 'a.th_title']
-            for selector in title_selectors:
-                title_element = post_element.find(selector, first=True)
-                if title_element:
-                    title = title_element.text.strip()
-                    post_link = title_element.attrs.get('href', '')
-                    break
-            
-            author = "匿名用户"
-            author_selectors = ['.tb_icon_author', '.frs-author-name', '.threadlist_author']
-            for selector in author_selectors:
-                author_element = post_element.find(selector, first=True)
-                if author_element:
-                    author = author_element.text.strip()
-                    break
-            
-            reply_count = "0"
-            reply_selectors = ['.threadlist_rep_num', '.j_reply_num']
-            for selector in reply_selectors:
-                reply_element = post_element.find(selector, first=True)
-                if reply_element:
-                    reply_count = reply_element.text.strip()
-                    break
-            
+            return await self.build_post(self.extract_post_fields(post_element))
+        except Exception as e:
+            logger.warning(f"解析帖子元素失败: {e}")
+            return None
+
+    async def build_post(self, fields):
+        """根据列表项字段抓取帖子内容，组装成一条帖子记录；内容抓取失败或解析出错时返回 None"""
+        try:
+            title, post_link = fields['title'], fields['post_link']
+            author, reply_count = fields['author'], fields['reply_count']
+            post_url = self.post_url(post_link)
+            crawl_time = time.strftime("%Y-%m-%d %H:%M:%S")
             content = ""
-            if post_link:
-                content = await self.fetch_post_content(post_link)
+            cached = None
+            if self.thread_index is not None and post_url:
+                cached = self.thread_index.get_unchanged(post_url, reply_count)
+            if cached is not None:
+                content = cached['content']
+                self.index_skips += 1
+            elif post_link and self.full_thread:
+                content = await self.fetch_thread(post_link, title,
+                                                  priority=thread_priority(reply_count, self.low_value_replies))
+            elif post_link:
+                content = await self.fetch_post_content(
+                    post_link, priority=thread_priority(reply_count, self.low_value_replies))
+                # 获取失败（None）时不写索引，下次运行会重新抓取
+                if content is not None:
+                    content = content[:500]
+                    if self.thread_index is not None:
+                        self.thread_index.update(post_url, reply_count, content, crawl_time)
+            if content is None:
+                # 内容最终抓取失败（已记入 errors）：不输出只有标题的记录，也就不会记入断点，
+                # --resume 或下次运行会重新抓取这个帖子
+                logger.warning(f"帖子内容抓取失败，本次不输出: {post_url}")
+                return None
             
             return {
                 'title': title,
                 'author': author,
                 'reply_count': reply_count,
-                'content': content[:500] if content else "无法获取内容",
-                'post_url': f"https://tieba.baidu.com{post_link}" if post_link else '',
-                'crawl_time': time.strftime("%Y-%m-%d %H:%M:%S")
+                'content': content or '',
+                'post_url': post_url,
+                'crawl_time': crawl_time
             }
         except Exception as e:
             logger.warning(f"解析帖子元素失败: {e}")
             return None
     
-    async def fetch_post_content(self, post_link):
-        """【内容】采用上传文件版本获取内容逻辑（建议增加重试机制）"""
+    async def fetch_post_content(self, post_link, priority=(PRIORITY_THREAD, 0)):
+        """【内容】采用上传文件版本获取内容逻辑
+
+        返回帖子正文；页面中没有正文时返回空字符串，抓取失败时返回 None 并记录到 errors。
+        """
+        if not post_link:
+            return ''
+        url = self.post_url(post_link)
         try:
-            if not post_link:
-                return "无内容链接"
-                
-            url = f"https://tieba.baidu.com{post_link}"
             logger.info(f"获取帖子内容: {url}")
-            
-            # 可考虑在此处添加重试循环，例如 for attempt in range(2):
-            response = await self.session.get(url, headers=self.get_headers(), timeout=15)
-            await response.html.arender(timeout=20, sleep=3)  # 可适当增加sleep时间
-            
-            content_selectors = ['.d_post_content', '.post_content', '.j_d_post_content', '.core_reply_content', '.l_post_content']
-            for selector in content_selectors:
-                content_elements = response.html.find(selector)
-                if content_elements:
-                    for elem in content_elements:
-                        content_text = elem.text.strip()
-                        if content_text and len(content_text) > 10:
-                            return content_text
-            return "无法提取内容"
+            html = await self.fetch_html(url, ', '.join(CONTENT_SELECTORS), 'thread',
+                                         timeout=15, render_timeout=20, sleep=3, priority=priority)
+            with self.metrics.timer('parse', 'thread'):
+                return self.extract_content(html)
+        except FetchError as e:
+            self.record_error(e, 'thread')
+            return None
         except Exception as e:
-            logger.warning(f"获取帖子内容失败: {e}")
-            return f"内容获取失败: {str(e)}"
+            self.record_error(FetchError(url, type(e).__name__, str(e)), 'thread')
+            return None
     
-    async def crawl_tieba(self, max_pages=5):
-        """主爬虫方法"""
+    async def fetch_thread(self, post_link, title='', priority=(PRIORITY_THREAD, 0)):
+        """完整模式：抓取帖子的所有回复页，楼层逐页写入 reply_sink，返回 1 楼正文（失败时返回 None）
+
+        第 1 页决定总页数，其余页由至多 reply_page_concurrency 个协程依次领取，
+        每页解析完立即写出，内存中只保留在途的几页，与帖子回复数无关。
+        单个回复页失败只记录到 errors，不影响其余页；断点恢复时未完成的帖子会整帖重抓，
+        回复记录可能重复，下游按 (post_url, floor) 去重。
+        """
+        from .lxml_parser import parse_reply_page_count
+
+        post_url = self.post_url(post_link)
+        try:
+            logger.info(f"获取帖子全部回复: {post_url}")
+            html = await self.fetch_html(post_url, ', '.join(CONTENT_SELECTORS), 'thread',
+                                         timeout=15, render_timeout=20, sleep=3, priority=priority)
+        except FetchError as e:
+            self.record_error(e, 'thread')
+            return None
+        except Exception as e:
+            self.record_error(FetchError(post_url, type(e).__name__, str(e)), 'thread')
+            return None
+        with self.metrics.timer('parse', 'thread'):
+            content = self.extract_content(html)
+            total_pages = parse_reply_page_count(html.html)
+        self._emit_replies(html, post_url, title)
+        if self.max_reply_pages:
+            total_pages = min(total_pages, self.max_reply_pages)
+
+        pages = iter(range(2, total_pages + 1))
+
+        async def worker():
+            # 共享同一个页码迭代器，协程之间不会领到同一页
+            for page_num in pages:
+                await self._crawl_reply_page(post_url, title, page_num, priority)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.reply_page_concurrency, total_pages - 1))))
+        return content
+
+    async def _crawl_reply_page(self, post_url, title, page_num, priority):
+        url = f"{post_url}?pn={page_num}"
+        try:
+            html = await self.fetch_html(url, '.l_post', 'reply', timeout=15, render_timeout=20, sleep=3,
+                                         priority=priority)
+        except FetchError as e:
+            self.record_error(e, 'reply')
+            return
+        except Exception as e:
+            self.record_error(FetchError(url, type(e).__name__, str(e)), 'reply')
+            return
+        self._emit_replies(html, post_url, title)
+
+    def _emit_replies(self, html, post_url, title):
+        from .lxml_parser import parse_thread_replies
+
+        with self.metrics.timer('parse', 'reply'):
+            replies = parse_thread_replies(html.html)
+        crawl_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        for reply in replies:
+            reply.update(post_url=post_url, thread_title=title, crawl_time=crawl_time)
+            self.reply_sink.write(reply)
+        self.total_replies += len(replies)
+
+    @staticmethod
+    def extract_content(html):
+        """按 CONTENT_SELECTORS 顺序取第一段长度超过 10 的正文，没有时返回空字符串"""
+        for selector in CONTENT_SELECTORS:
+            content_elements = html.find(selector)
+            if content_elements:
+                for elem in content_elements:
+                    content_text = elem.text.strip()
+                    if content_text and len(content_text) > 10:
+                        return content_text
+        return ''
+
+    async def crawl_tieba(self, max_pages=5, time_budget=None):
+        """主爬虫方法
+
+        time_budget: 时间预算（秒）。列表页优先、帖子按回复数从高到低调度，
+        到期时取消所有未完成的请求，已写出的帖子保留，未完成的页可通过断点继续。
+        """
         logger.info(f"开始爬取贴吧: {self.tieba_name}")
+        deadline = time.monotonic() + time_budget if time_budget else None
         try:
-            total_pages = await self.get_total_pages()
-            pages_to_crawl = min(total_pages, max_pages)
-            logger.info(f"计划抓取前 {pages_to_crawl} 页")
-            
-            tasks = [self.fetch_page_posts(page_num) for page_num in range(1, pages_to_crawl + 1)]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if self.checkpoint is not None and self.checkpoint.started:
+                pages = self.checkpoint.pending_pages()
+                logger.info(f"断点中还有 {len(pages)} 页未完成")
+            else:
+                total_pages = await self.get_total_pages()
+                pages = list(range(1, min(total_pages, max_pages) + 1))
+                logger.info(f"计划抓取前 {len(pages)} 页")
+                if self.checkpoint is not None:
+                    self.checkpoint.plan(pages)
             
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"第 {i+1} 页抓取异常: {result}")
-                elif result:
-                    self.posts_data.extend(result)
+            # 所有页面同时提交，真正的网络并发由 self.scheduler 限制；每个帖子完成后立即写出
+            await self._crawl_pages(pages, deadline)
+            if self.checkpoint is not None and not self.checkpoint.pending_pages():
+                self.checkpoint.finish()
                     
-            logger.info(f"爬取完成! 总共获取 {len(self.posts_data)} 个帖子")
+            logger.info(f"爬取完成! 总共获取 {self.total_posts} 个帖子，失败请求 {len(self.errors)} 个，"
+                        f"重试 {self.fetch_policy.retries} 次")
+            if self.reply_sink is not None:
+                logger.info(f"完整模式: 写出 {self.total_replies} 条回复到 {self.reply_sink.path}")
+            logger.info(f"静态解析命中: {dict(self.static_hits)}，回退渲染: {dict(self.render_fallbacks)}")
+            if self.throttle is not None:
+                logger.info(f"自适应并发: 当前上限 {self.throttle.limit}，拥塞信号 {self.throttle.signals}")
+            if self.cache is not None:
+                logger.info(f"响应缓存: 命中 {self.cache.hits}，304 重新验证 {self.cache.revalidated}，"
+                            f"未命中 {self.cache.misses}")
+            if self.thread_index is not None:
+                self.thread_index.commit()
+                logger.info(f"增量抓取: {self.index_skips} 个帖子回复数未变化，跳过内容请求")
         except Exception as e:
             logger.error(f"爬虫执行失败: {e}")
+        finally:
+            # 正常结束、异常或 Ctrl-C 取消时都保存一次断点
+            if self.checkpoint is not None:
+                self.checkpoint.save()
     
-    def save_to_csv(self, filename=None):
+    async def _crawl_pages(self, pages, deadline=None):
+        """并发抓取各页，deadline（time.monotonic() 时间）到达时取消剩余任务"""
+        pending = {asyncio.ensure_future(self._crawl_page(page_num)) for page_num in pages}
+        try:
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.budget_exhausted = True
+                    logger.warning(f"时间预算已用完，取消 {len(pending)} 个未完成的页面，"
+                                   f"已获取 {self.total_posts} 个帖子")
+                    break
+                for task in done:
+                    if task.exception() is not None:
+                        logger.error(f"页面抓取异常: {task.exception()}")
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def emit(self, post):
+        """输出一条帖子记录：配置了 sink 时直接写盘，否则追加到 posts_data"""
+        if self.sink is not None:
+            self.sink.write(post)
+        else:
+            self.posts_data.append(post)
+        self.total_posts += 1
+        if self.checkpoint is not None:
+            self.checkpoint.mark_thread(post.get('post_url'))
+
+    def iter_posts(self):
+        """按产生顺序逐条遍历已抓取的帖子"""
+        if self.sink is not None:
+            return iter(self.sink)
+        return iter(self.posts_data)
+
+    def save_to_csv(self, filename=None, chunk_size=1000):
         if not filename:
             filename = f"{self.tieba_name}_posts_{time.strftime('%Y%m%d_%H%M%S')}.csv"
-        if self.posts_data:
-            df = pd.DataFrame(self.posts_data)
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            logger.info(f"数据已保存到: {filename}")
-            return filename
-        else:
+        posts = self.iter_posts()
+        first = next(posts, None)
+        if first is None:
             logger.warning("没有数据可保存")
             return None
+        import pandas  # 只有导出 CSV 才需要 pandas
+
+        # 分块写入，避免一次性构建完整的 DataFrame
+        posts = chain([first], posts)
+        columns = list(first.keys())
+        with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+            for i, chunk in enumerate(iter(lambda: list(islice(posts, chunk_size)), [])):
+                df = pandas.DataFrame(chunk).reindex(columns=columns)
+                df.to_csv(f, index=False, header=(i == 0))
+        logger.info(f"数据已保存到: {filename}")
+        return filename
     
     def save_to_json(self, filename=None):
         if not filename:
             filename = f"{self.tieba_name}_posts_{time.strftime('%Y%m%d_%H%M%S')}.json"
-        if self.posts_data:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.posts_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"数据已保存到: {filename}")
-            return filename
-        else:
+        posts = self.iter_posts()
+        first = next(posts, None)
+        if first is None:
             logger.warning("没有数据可保存")
             return None
+        write_json_array(chain([first], posts), filename)
+        logger.info(f"数据已保存到: {filename}")
+        return filename
     
     def display_statistics(self):
-        if not self.posts_data:
+        # 单次遍历汇总统计，帖子写在 sink 中时同样不需要全部读入内存
+        total, title_len, content_len, authors, samples = 0, 0, 0, set(), []
+        for post in self.iter_posts():
+            total += 1
+            authors.add(post.get('author'))
+            title_len += len(post.get('title') or '')
+            content_len += len(post.get('content') or '')
+            if len(samples) < 3:
+                samples.append(post)
+        if not total:
             print("没有爬取到数据")
             return
-        df = pd.DataFrame(self.posts_data)
         print(f"\n贴吧 '{self.tieba_name}' 爬取统计")
-        print(f"总帖子数: {len(self.posts_data)}")
-        print(f"作者数量: {df['author'].nunique()}")
-        if len(self.posts_data) > 0:
-            print(f"标题平均长度: {df['title'].str.len().mean():.2f} 字符")
-            print(f"内容平均长度: {df['content'].str.len().mean():.2f} 字符")
+        print(f"总帖子数: {total}")
+        print(f"作者数量: {len(authors)}")
+        if self.reply_sink is not None:
+            print(f"回复记录: {self.total_replies} 条（{self.reply_sink.path}）")
+        if self.errors:
+            kinds = Counter(error['kind'] for error in self.errors)
+            print(f"失败请求: {len(self.errors)} 个 {dict(kinds)}")
+        if self.throttle is not None:
+            print(f"自适应并发上限: {self.throttle.limit}（共调整 {len(self.throttle.history) - 1} 次）")
+        if self.static_first:
+            hits, fallbacks = sum(self.static_hits.values()), sum(self.render_fallbacks.values())
+            print(f"静态解析命中: {hits} 次，回退渲染: {fallbacks} 次 {dict(self.render_fallbacks)}")
+        self.display_metrics()
+        print(f"标题平均长度: {title_len / total:.2f} 字符")
+        print(f"内容平均长度: {content_len / total:.2f} 字符")
         print("\n前3个帖子示例:")
-        for i, post in enumerate(self.posts_data[:3]):
+        for i, post in enumerate(samples):
             print(f"{i+1}. 标题: {post['title'][:50]}...")
             print(f"   作者: {post['author']}")
             print(f"   回复: {post['reply_count']}")
@@ -213,17 +927,144 @@ class TiebaSpider:
             print(f"   内容预览: {content_preview}")
             print()
     
+    def display_metrics(self):
+        """打印各阶段耗时分布、各类页面成功/失败次数和下载字节数"""
+        summary = self.metrics.summary()
+        if not summary['stages']:
+            return
+        print(f"\n阶段耗时（共 {summary['elapsed_seconds']:.1f} 秒）:")
+        print(f"  {'阶段.页面':<16}{'次数':>6}{'合计(s)':>10}{'平均(s)':>9}{'p50(s)':>9}{'p95(s)':>9}{'最大(s)':>9}")
+        for name, stats in summary['stages'].items():
+            print(f"  {name:<16}{stats['count']:>6}{stats['sum']:>10.2f}{stats['mean']:>9.3f}"
+                  f"{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['max']:>9.3f}")
+        totals = self.metrics.stage_totals()
+        print("  各阶段合计: " + "，".join(f"{stage} {seconds:.1f}s" for stage, seconds in totals.most_common()))
+        for page_type, outcome in summary['pages'].items():
+            size = summary['bytes'].get(page_type, 0)
+            print(f"  {page_type} 页: 成功 {outcome['success']}，失败 {outcome['failure']}，"
+                  f"下载 {size / 1024:.1f} KB")
+
+    def run_summary(self):
+        """本次运行的 JSON 摘要：分阶段指标加上帖子数、失败、重试、缓存和并发等计数"""
+        summary = self.metrics.summary()
+        summary.update({
+            'total_posts': self.total_posts,
+            'errors': dict(Counter(error['kind'] for error in self.errors)),
+            'retries': self.fetch_policy.retries,
+            'static_hits': dict(self.static_hits),
+            'render_fallbacks': dict(self.render_fallbacks),
+            'index_skips': self.index_skips,
+            'total_replies': self.total_replies,
+            'budget_exhausted': self.budget_exhausted,
+        })
+        if self.cache is not None:
+            summary['cache'] = {'hits': self.cache.hits, 'revalidated': self.cache.revalidated,
+                                'misses': self.cache.misses}
+        if self.throttle is not None:
+            summary['concurrency_limit'] = self.throttle.limit
+        return summary
+
+    def save_metrics(self, json_path=None, prometheus_path=None):
+        """保存 JSON 运行摘要，并可选写出 Prometheus 文本格式，返回 JSON 文件路径"""
+        if not json_path:
+            json_path = f"{self.tieba_name}_metrics_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.run_summary(), f, ensure_ascii=False, indent=2)
+        if prometheus_path:
+            self.metrics.export_prometheus(prometheus_path)
+        logger.info(f"运行指标已保存到: {json_path}")
+        return str(json_path)
+
+    def save_errors(self, filename=None):
+        """把结构化的失败记录保存为 JSON，便于排查与补抓"""
+        if not self.errors:
+            return None
+        if not filename:
+            filename = f"{self.tieba_name}_errors_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.errors, f, ensure_ascii=False, indent=2)
+        logger.info(f"失败记录已保存到: {filename}")
+        return filename
+
     async def close(self):
-        await self.session.close()
+        if self._owns_scheduler:
+            await self.scheduler.close()
+        if self._owns_tab_pool and self._tab_pool is not None:
+            await self._tab_pool.close()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        if self.thread_index is not None:
+            self.thread_index.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.sink is not None:
+            self.sink.close()
+        if self.reply_sink is not None:
+            self.reply_sink.close()
+
+
+async def crawl_many(tieba_names, max_pages=5, output_dir='.', concurrency=8, per_host_rate=4.0,
+                     tab_pool_size=4, tab_max_renders=50, adaptive=True, max_concurrency=32, time_budget=None,
+                     **spider_kwargs):
+    """在同一个事件循环中批量爬取多个贴吧
+
+    所有贴吧共用一个会话、浏览器标签页池、调度器（含单主机限速）和重试熔断策略，
+    调度器按贴吧轮询出队，大贴吧不会挤占小贴吧。每个贴吧单独输出一个 JSON 文件，
+    返回 {贴吧名: 文件路径}，没有数据的贴吧对应 None。
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    run_id = int(time.time())
+    from requests_html import AsyncHTMLSession
+    session = AsyncHTMLSession()
+    controller = AIMDController(initial=concurrency, maximum=max(concurrency, max_concurrency)) if adaptive else None
+    scheduler = CrawlScheduler(concurrency=concurrency, per_host_rate=per_host_rate, controller=controller)
+    tab_pool = BrowserTabPool(session, size=tab_pool_size, max_renders=tab_max_renders)
+    spider_kwargs.setdefault('fetch_policy', FetchPolicy())
+    spiders = [
+        TiebaSpider(name, session=session, scheduler=scheduler, tab_pool=tab_pool,
+                    sink_path=output_dir / f"{name}_raw_{run_id}.jsonl", **spider_kwargs)
+        for name in dict.fromkeys(tieba_names)
+    ]
+    outputs = {}
+    try:
+        results = await asyncio.gather(*(spider.crawl_tieba(max_pages=max_pages, time_budget=time_budget)
+                                         for spider in spiders),
+                                       return_exceptions=True)
+        for spider, result in zip(spiders, results):
+            if isinstance(result, Exception):
+                logger.error(f"贴吧 '{spider.tieba_name}' 爬取异常: {result}")
+            outputs[spider.tieba_name] = spider.save_to_json(
+                str(output_dir / f"{spider.tieba_name}_raw_{run_id}.json"))
+            spider.save_metrics(output_dir / f"{spider.tieba_name}_metrics_{run_id}.json")
+    finally:
+        for spider in spiders:
+            await spider.close()
+        await scheduler.close()
+        await tab_pool.close()
+        await session.close()
+    return outputs
+
 
 async def main():
-    tieba_name = input('欢迎使用"听涛"！请输入要检索分析的贴吧名称: ').strip() or "python"
+    names = input('欢迎使用"听涛"！请输入要检索分析的贴吧名称（多个用逗号分隔）: ').strip() or "python"
     try:
         max_pages = int(input("请输入取样的页数（默认1）: ") or "1")
     except:
         max_pages = 1
+
+    tieba_names = [name.strip() for name in re.split(r'[,，]', names) if name.strip()]
+    if len(tieba_names) > 1:
+        start_time = time.time()
+        outputs = await crawl_many(tieba_names, max_pages=max_pages)
+        print(f"\n批量爬取完成！耗时：{time.time() - start_time:.2f} 秒")
+        for name, path in outputs.items():
+            print(f"  {name}: {path or '没有数据'}")
+        return
+    tieba_name = tieba_names[0]
     
-    spider = TiebaSpider(tieba_name)
+    # 与 crawl_many 相同，帖子逐条写入 JSONL，内存占用与页数无关，中途崩溃时已抓到的帖子也不会丢失
+    spider = TiebaSpider(tieba_name, sink_path=f"{tieba_name}_raw_{int(time.time())}.jsonl")
     try:
         start_time = time.time()
         await spider.crawl_tieba(max_pages=max_pages)
@@ -231,6 +1072,8 @@ async def main():
         spider.display_statistics()
         csv_file = spider.save_to_csv()
         json_file = spider.save_to_json()
+        spider.save_errors()
+        spider.save_metrics()
         print(f"\n爬取完成！耗时：{end_time - start_time:.2f} 秒")
         if csv_file:
             print(f"数据已保存到：{csv_file} 和 {json_file}")
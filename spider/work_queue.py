@@ -0,0 +1,107 @@
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    __slots__ = ('id', 'kind', 'payload', 'attempts')
+
+    def __init__(self, job_id, kind, payload, attempts):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+
+class WorkQueue:
+    """基于 SQLite 的持久化本地任务队列，可被多个进程同时使用
+
+    任务被 lease 后在 lease_seconds 内对其他进程不可见；worker 崩溃或超时未 ack 的任务
+    会重新被领取（至少一次投递），因此任务处理需要能容忍重复执行。
+    key 相同的任务只会入队一次；领取超过 max_attempts 次的任务标记为 failed。
+    长租约只用于崩溃恢复，处理失败的任务应由 worker 调用 release() 尽快交还。
+    """
+
+    def __init__(self, db_path, lease_seconds=300, max_attempts=3):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " key TEXT UNIQUE,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " worker TEXT,"
+            " lease_until REAL NOT NULL DEFAULT 0,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, lease_until)")
+
+    def put(self, kind, payload, key=None):
+        """入队一个任务，key 已存在时忽略，返回是否新入队"""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, payload, key) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload, ensure_ascii=False), key)
+        )
+        return cursor.rowcount > 0
+
+    def lease(self, worker_id):
+        """领取一个待处理或租约已过期的任务，没有可领取的任务时返回 None"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET state = 'failed' WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs"
+                " WHERE (state = 'pending' AND lease_until <= ?) OR (state = 'leased' AND lease_until < ?)"
+                " ORDER BY id LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            job_id, kind, payload, attempts = row
+            self.conn.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1"
+                " WHERE id = ?",
+                (worker_id, now + self.lease_seconds, job_id)
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return Job(job_id, kind, json.loads(payload), attempts + 1)
+
+    def ack(self, job_id):
+        self.conn.execute("UPDATE jobs SET state = 'done', lease_until = 0 WHERE id = ?", (job_id,))
+
+    def release(self, job_id, delay=0):
+        """放弃租约，delay 秒后任务可被重新领取；已用完 max_attempts 次尝试的任务直接标记为 failed"""
+        self.conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, lease_until = ?"
+            " WHERE id = ?",
+            (self.max_attempts, time.time() + delay, job_id)
+        )
+
+    def unfinished(self):
+        """尚未完成（待处理或处理中）的任务数"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        self.conn.close()